@@ -7,6 +7,7 @@ from .user_routes import router as user_router
 from .files_routes import router as files_router
 from .warranty_routes import router as warranty_router
 from .equipment_routes import router as equipment_router
+from .cache_routes import router as cache_router
 
 endpoints_router = APIRouter()
 
@@ -16,3 +17,4 @@ endpoints_router.include_router(case_router)  # /cases/** (включает warr
 endpoints_router.include_router(files_router)  # /files/**
 endpoints_router.include_router(references_router)  # /references/**
 endpoints_router.include_router(equipment_router)  # /equipment/**
+endpoints_router.include_router(cache_router)  # /cache/**
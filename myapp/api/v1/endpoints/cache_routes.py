@@ -0,0 +1,51 @@
+from fastapi import APIRouter, Depends, Path, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Annotated
+
+from myapp.auth.dependencies import require_superadmin
+from myapp.database.base import get_db
+from myapp.models.user import User
+from myapp.schemas.cache import CacheOverviewResponse, DbGovernorResponse
+from myapp.services.cache_admin_service import CacheAdminService
+
+router = APIRouter(prefix="/cache", tags=["Кеш"])
+
+
+@router.get(
+    "/namespaces",
+    response_model=CacheOverviewResponse,
+    summary="Пространства имен кеша и метрики",
+)
+async def get_cache_overview(
+    _admin: Annotated[User, Depends(require_superadmin)],
+    top_keys: Annotated[
+        int, Query(description="Сколько крупнейших ключей показать", ge=0, le=100)
+    ] = 10,
+):
+    """Метрики считаются отдельно в каждом воркере (см. worker_pid)"""
+    return await CacheAdminService.get_overview(top_keys)
+
+
+@router.delete(
+    "/namespaces/{namespace}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="Очистить пространство имен кеша",
+)
+async def purge_cache_namespace(
+    namespace: Annotated[str, Path(description="Пространство имен")],
+    session: Annotated[AsyncSession, Depends(get_db)],
+    _admin: Annotated[User, Depends(require_superadmin)],
+):
+    await CacheAdminService.purge_namespace(session, namespace)
+
+
+@router.get(
+    "/db-governor",
+    response_model=DbGovernorResponse,
+    summary="Очереди и лимиты допуска к пулу БД",
+)
+async def get_db_governor_stats(
+    _admin: Annotated[User, Depends(require_superadmin)],
+):
+    """Метрики считаются отдельно в каждом воркере (см. worker_pid)"""
+    return CacheAdminService.get_db_governor_stats()
@@ -10,11 +10,13 @@ from myapp.schemas.cases import (
     CaseCreate,
     CaseUpdate,
     SupplierPreviewRequest,
+    StatusDashboardResponse,
 )
 from myapp.schemas.filters import CaseFilterParams
 from myapp.services.equipment_service import EquipmentService
 from myapp.services.case_service import CaseService
 from myapp.services.case_filter_service import CaseFilterService
+from myapp.services.case_status_history_service import CaseStatusHistoryService
 from myapp.database.base import get_db
 from .warranty_routes import router as warranty_router
 from .export_routes import router as export_router
@@ -42,8 +44,31 @@ async def list_and_filter_cases(
     session: Annotated[AsyncSession, Depends(get_db)],
     _user: Annotated[User, Depends(require_viewer_or_higher)],
 ):
-    """Получить список случаев неисправности, используя параметры фильтрации"""
-    return await CaseFilterService.filter_cases(session, params)
+    """
+    Получить список случаев неисправности, используя параметры фильтрации.
+    С cursor_mode страницы запрашиваются по next_cursor / prev_cursor вместо skip.
+    """
+    try:
+        return await CaseFilterService.filter_cases(session, params)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+# Сводка по статусам (до /{case_id}, иначе путь примется за id случая)
+@router.get(
+    "/status-dashboard",
+    response_model=StatusDashboardResponse,
+    summary="Число случаев по статусам и срокам нахождения в статусе",
+)
+async def get_status_dashboard(
+    session: Annotated[AsyncSession, Depends(get_db)],
+    _user: Annotated[User, Depends(require_viewer_or_higher)],
+    older_than_days: Annotated[
+        int, Query(ge=0, description="Сколько случаев в статусе дольше N дней")
+    ] = 30,
+):
+    """Считается по сводке сроков, а не по всем случаям"""
+    return await CaseStatusHistoryService.get_dashboard(session, older_than_days)
 
 
 # Создание
@@ -71,12 +71,11 @@ async def get_equipment_chain(
     summary="Получить всё оборудование плоским списком с путями иерархии",
 )
 async def get_all_equipment_flat(
-    session: Annotated[AsyncSession, Depends(get_db)],
     _user: Annotated[User, Depends(require_viewer_or_higher)],
 ):
     """Возвращает всё оборудование в плоском виде с полным путем иерархии"""
 
-    return await EquipmentService.get_all_equipment_flat(session)
+    return await EquipmentService.get_all_equipment_flat()
 
 
 @router.post(
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Query, Depends
+from fastapi import APIRouter, Query, Depends, HTTPException, Request, status
 from typing import Annotated
 
 from myapp.auth.dependencies import (
@@ -11,9 +11,22 @@ from myapp.schemas.references import (
     CaseFormReferencesResponse,
     EquipmentManagementReferencesResponse,
 )
-from myapp.schemas.filters import FilterOptionsResponse, CaseFilterParams
+from myapp.schemas.filters import (
+    FilterOptionsResponse,
+    CaseFilterParams,
+    FacetValuesResponse,
+    TypeaheadResponse,
+)
+from myapp.constants.filter_constants import (
+    FACET_VALUES_PAGE_SIZE,
+    FACET_VALUES_MAX_PAGE_SIZE,
+    TYPEAHEAD_LIMIT,
+    TYPEAHEAD_MAX_LIMIT,
+    TYPEAHEAD_MIN_QUERY_LENGTH,
+)
 from myapp.services.reference_service import ReferenceService
 from myapp.services.case_filter_service import CaseFilterService
+from myapp.utils.request_utils import cancel_on_disconnect
 
 
 router = APIRouter(prefix="/references", tags=["Выпадающие списки"])
@@ -36,9 +49,76 @@ async def get_case_form_references(
     summary="Получить опции для фильтров",
 )
 async def get_filter_options(
+    request: Request,
+    _user: Annotated[User, Depends(require_viewer_or_higher)],
+    compact: Annotated[
+        bool,
+        Query(description="Без полей с большим числом значений (номера, серийники)"),
+    ] = False,
+):
+    return await cancel_on_disconnect(
+        request, CaseFilterService.get_filter_options(compact)
+    )
+
+
+@router.get(
+    "/filter-options/{facet}/values",
+    response_model=FacetValuesResponse,
+    summary="Получить значения поля фильтра постранично с поиском",
+)
+async def search_facet_values(
+    facet: str,
+    _user: Annotated[User, Depends(require_viewer_or_higher)],
+    q: Annotated[str, Query(max_length=200, description="Начало значения")] = "",
+    substring: Annotated[
+        bool, Query(description="Искать вхождение в любом месте значения")
+    ] = False,
+    limit: Annotated[
+        int, Query(ge=1, le=FACET_VALUES_MAX_PAGE_SIZE)
+    ] = FACET_VALUES_PAGE_SIZE,
+    cursor: Annotated[
+        str | None, Query(description="next_cursor прошлой страницы")
+    ] = None,
+):
+    """Значения с числом случаев, по алфавиту без учета регистра"""
+    try:
+        return await CaseFilterService.search_facet_values(
+            facet, q, substring, limit, cursor
+        )
+    except LookupError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.get(
+    "/typeahead/{field}",
+    response_model=TypeaheadResponse,
+    summary="Подсказки по фрагменту серийного номера, номера локомотива или документа",
+)
+async def typeahead(
+    field: str,
     _user: Annotated[User, Depends(require_viewer_or_higher)],
+    q: Annotated[
+        str,
+        Query(
+            min_length=TYPEAHEAD_MIN_QUERY_LENGTH,
+            max_length=200,
+            description="Фрагмент значения",
+        ),
+    ],
+    limit: Annotated[int, Query(ge=1, le=TYPEAHEAD_MAX_LIMIT)] = TYPEAHEAD_LIMIT,
 ):
-    return await CaseFilterService.get_filter_options()
+    """
+    Значения с числом случаев: точные совпадения, затем по началу, затем
+    похожие. Тот же фрагмент можно передать в фильтр <поле>_contains.
+    """
+    try:
+        return await CaseFilterService.typeahead(field, q, limit)
+    except LookupError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
 @router.get(
@@ -47,11 +127,17 @@ async def get_filter_options(
     summary="Получить динамические опции для фильтров на основе выбранных значений",
 )
 async def get_dynamic_filter_options(
+    request: Request,
     _user: Annotated[User, Depends(require_viewer_or_higher)],
     params: Annotated[CaseFilterParams, Query()] = CaseFilterParams(),
 ):
-    """Получить опции фильтров с учетом уже выбранных значений"""
-    return await CaseFilterService.get_dynamic_filter_options(params)
+    """
+    Получить опции фильтров с учетом уже выбранных значений.
+    Если часть опций не успела посчитаться, ответ помечается degraded.
+    """
+    return await cancel_on_disconnect(
+        request, CaseFilterService.get_dynamic_filter_options(params)
+    )
 
 
 @router.get(
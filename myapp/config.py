@@ -17,6 +17,39 @@ class Settings(BaseSettings):
 
     CORS_ORIGINS: str = "http://localhost:5173,http://91.184.246.250:3333"
 
+    # Ограничения in-memory кеша (на одно пространство имен)
+    CACHE_MAX_ENTRIES: int = 1000
+    CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    CACHE_SWEEP_INTERVAL: int = 60
+
+    # Хранилище кеша: "memory" - свое в каждом воркере,
+    # "shared" - общий файл SQLite для всех воркеров на хосте
+    CACHE_BACKEND: str = "memory"
+    CACHE_SHARED_PATH: str = "/tmp/complaint_cache.sqlite3"
+
+    # Канал LISTEN/NOTIFY для инвалидации кеша во всех воркерах
+    CACHE_INVALIDATION_CHANNEL: str = "cache_invalidation"
+
+    # Прогрев кеша при запуске: не дольше CACHE_WARMUP_TIMEOUT секунд
+    CACHE_WARMUP_ENABLED: bool = True
+    CACHE_WARMUP_CONCURRENCY: int = 2
+    CACHE_WARMUP_TIMEOUT: float = 30.0
+
+    # Опции фильтров одним агрегирующим запросом (False - по запросу на фасет)
+    FILTER_OPTIONS_SINGLE_QUERY: bool = True
+
+    # Контроль допуска к пулу БД: доля подключений для веерных загрузок
+    # и порог ожидания подключения (с), выше которого их лимит снижается
+    DB_GOVERNOR_BULK_SHARE: float = 0.5
+    DB_GOVERNOR_POOL_WAIT_TARGET: float = 0.05
+    # Сколько ждать места (с), прежде чем ответить 503
+    DB_GOVERNOR_ACQUIRE_TIMEOUT: float = 10.0
+
+    # Индекс фасетов в памяти воркера: динамические опции фильтров и total
+    # списка случаев считаются по битовым маскам без запросов к БД
+    FACET_INDEX_ENABLED: bool = False
+    FACET_INDEX_REBUILD_INTERVAL: int = 60 * 60
+
     @property
     def partner_access_list(self) -> set[str]:
         """Достает строку разрешенных имен для совместного редактирования из .env"""
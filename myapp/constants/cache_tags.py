@@ -0,0 +1,33 @@
+"""Теги кеша: таблицы, от которых зависят закешированные данные"""
+
+TAG_SUPPLIERS = "suppliers"
+TAG_MALFUNCTIONS = "malfunctions"
+TAG_EQUIPMENT = "equipment"
+TAG_EQUIPMENT_MALFUNCTIONS = "equipment_malfunctions"
+
+# Таблицы случаев
+TAG_CASES = "repair_case_equipment"
+TAG_WARRANTY_WORK = "warranty_work"
+TAG_WAYBILL_DOCS = "waybill_docs"
+
+# Прочие справочники (регионы, модели локомотивов, типы ремонта и т.д.)
+TAG_REFERENCES = "references"
+
+CASE_TAGS = (TAG_CASES, TAG_WARRANTY_WORK, TAG_WAYBILL_DOCS)
+
+# Опции фильтров строятся по случаям и названиям из справочников
+FILTER_OPTIONS_TAGS = (
+    *CASE_TAGS,
+    TAG_SUPPLIERS,
+    TAG_MALFUNCTIONS,
+    TAG_EQUIPMENT,
+    TAG_REFERENCES,
+)
+
+# Справочники формы случая (оборудование грузится отдельно по уровням)
+CASE_FORM_REFERENCES_TAGS = (
+    TAG_SUPPLIERS,
+    TAG_MALFUNCTIONS,
+    TAG_EQUIPMENT_MALFUNCTIONS,
+    TAG_REFERENCES,
+)
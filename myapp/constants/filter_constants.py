@@ -29,8 +29,93 @@ SECTION_MASKS = [
     {"bit": 4, "name": "Бустер"},
 ]
 
-# Ограничение на количество одновременных запросов к БД
-DB_SEMAPHORE_LIMIT = 20
+# Ограничения кеша динамических опций фильтров (по числу записей и объему)
+DYNAMIC_FILTER_CACHE_MAX_ENTRIES = 256
+DYNAMIC_FILTER_CACHE_MAX_BYTES = 128 * 1024 * 1024
+
+# Наборы случаев-кандидатов динамических опций (см. near set в
+# FilterOptionsService): пространство имен кеша, время жизни и ограничения.
+# Больше NEAR_SET_MAX_IDS id набор не кешируется и не используется
+NEAR_SET_NAMESPACE = "filter_near_sets"
+NEAR_SET_TTL = 600
+NEAR_SET_MAX_IDS = 20000
+NEAR_SET_CACHE_MAX_ENTRIES = 256
+NEAR_SET_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Фасеты с большим числом значений: в компактном ответе опций фильтров
+# не передаются, значения ищутся постранично по префиксу
+LARGE_FACETS = frozenset(
+    {
+        "locomotive_numbers",
+        "component_serial_numbers",
+        "element_serial_numbers",
+        "component_serial_numbers_new",
+        "element_serial_numbers_new",
+        "notes",
+        "notification_numbers",
+        "re_notification_numbers",
+        "response_letter_numbers",
+        "claim_act_numbers",
+        "work_completion_act_numbers",
+        "research_documents",
+        "ttn_replacement",
+        "ttn_from_rc",
+        "ttn_to_supplier",
+        "ttn_from_supplier",
+    }
+)
+
+# Размер страницы значений фасета по умолчанию и максимальный
+FACET_VALUES_PAGE_SIZE = 50
+FACET_VALUES_MAX_PAGE_SIZE = 500
+
+# Поля с поиском по фрагменту (подсказки при вводе и фильтр <поле>_contains):
+# параметр фильтра -> колонка с trigram-индексом. Значения в колонках могут
+# быть списками через запятую, подсказки предлагают их по отдельности
+TYPEAHEAD_FIELDS = {
+    "locomotive_number": RepairCaseEquipment.locomotive_number,
+    "component_serial_number_old": RepairCaseEquipment.component_serial_number_old,
+    "element_serial_number_old": RepairCaseEquipment.element_serial_number_old,
+    "component_serial_number_new": RepairCaseEquipment.component_serial_number_new,
+    "element_serial_number_new": RepairCaseEquipment.element_serial_number_new,
+    "notification_number": WarrantyWork.notification_number,
+    "re_notification_number": WarrantyWork.re_notification_number,
+    "response_letter_number": WarrantyWork.response_letter_number,
+    "claim_act_number": WarrantyWork.claim_act_number,
+    "work_completion_act_number": WarrantyWork.work_completion_act_number,
+    "ttn_replacement": WaybillDoc.ttn_replacement,
+    "ttn_from_rc": WaybillDoc.ttn_from_rc,
+    "ttn_to_supplier": WaybillDoc.ttn_to_supplier,
+    "ttn_from_supplier": WaybillDoc.ttn_from_supplier,
+}
+
+# Короче трех символов у фрагмента нет триграмм, и индекс не помогает
+TYPEAHEAD_MIN_QUERY_LENGTH = 3
+TYPEAHEAD_LIMIT = 20
+TYPEAHEAD_MAX_LIMIT = 100
+
+# Ограничение времени запроса подсказок (мс)
+TYPEAHEAD_TIMEOUT_MS = 2000
+
+# До скольких значений в колонке индекса фасетов количества считаются
+# по маскам значений, больше - проходом по слотам случаев
+FACET_INDEX_BITMAP_MAX_VALUES = 1024
+
+# Ограничение времени подсчета случаев по значениям фасетов (мс)
+FACET_COUNTS_TIMEOUT_MS = 3000
+
+# Ограничения времени запросов опций фильтров (мс): одной задачи при
+# параллельном выполнении и общего запроса по всем фасетам. Фасеты,
+# не уложившиеся в ограничение, отдаются пустыми с признаком degraded
+FILTER_OPTION_TASK_TIMEOUT_MS = 5000
+FILTER_OPTIONS_QUERY_TIMEOUT_MS = 15000
+
+# Ограничение времени запроса одного справочника (мс)
+REFERENCES_QUERY_TIMEOUT_MS = 5000
+
+# Сколько секунд после истечения TTL отдавать прежние опции фильтров и
+# справочники формы, пока в фоне идет обновление
+STATIC_OPTIONS_STALE_TTL = 24 * 60 * 60
 
 # Конфигурация задач для получения опций фильтров
 FILTER_TASK_CONFIGS = [
@@ -1,3 +1,12 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+
+from fastapi import HTTPException, status
+from sqlalchemy import Index, text
 from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine, AsyncAttrs
 
@@ -6,21 +15,279 @@ from myapp.config import settings
 
 DATABASE_URL = settings.get_db_url()
 
+POOL_SIZE = 20
+MAX_OVERFLOW = 10
+
 engine = create_async_engine(
     url=DATABASE_URL,
-    pool_size=20,
-    max_overflow=10,
+    pool_size=POOL_SIZE,
+    max_overflow=MAX_OVERFLOW,
     pool_recycle=1800,
     pool_pre_ping=True,
     pool_timeout=30,
 )
 async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
 
+# Полосы допуска к БД: запросы обработчиков и веерные загрузки
+# (опции фильтров, справочники, прогрев, индекс фасетов)
+LANE_INTERACTIVE = "interactive"
+LANE_BULK = "bulk"
+
+# Задача, которая держит место в governor (для вложенных сессий той же задачи)
+_slot_holder: ContextVar[asyncio.Task | None] = ContextVar(
+    "db_governor_slot_holder", default=None
+)
+
+
+class DbAdmissionTimeout(HTTPException):
+    """Место в полосе не освободилось за DB_GOVERNOR_ACQUIRE_TIMEOUT"""
+
+    def __init__(self, lane: str):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="База данных перегружена, повторите запрос позже",
+        )
+        self.lane = lane
+
+
+@dataclass(slots=True)
+class LaneStats:
+    """Метрики полосы допуска"""
+
+    active: int = 0
+    waiting: int = 0
+    max_waiting: int = 0
+    admitted: int = 0
+    queued: int = 0
+    reentered: int = 0
+    timeouts: int = 0
+    total_wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+
+    def record_wait(self, seconds: float) -> None:
+        self.queued += 1
+        self.total_wait_seconds += seconds
+        self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    def as_dict(self) -> dict:
+        data = asdict(self)
+        data["avg_wait_seconds"] = (
+            self.total_wait_seconds / self.queued if self.queued else 0.0
+        )
+        return data
+
+
+class DbGovernor:
+    """
+    Единый контроль допуска к пулу подключений для всех сервисов.
+    Всего сессий не больше, чем подключений в пуле. Интерактивные запросы
+    всегда оставляют веерным загрузкам одно место и при освобождении мест
+    обслуживаются первыми. Лимит веерных загрузок подстраивается под время
+    ожидания подключения из пула (AIMD: плавно растет, пока ожидания нет,
+    и сокращается при превышении порога).
+
+    Допуск повторно входимый: вложенная сессия задачи, которая уже держит
+    место (get_db и сессия сервиса в том же запросе), нового места не ждет,
+    иначе внешние сессии, заняв все места, ждали бы вложенных бесконечно.
+    Ожидание ограничено acquire_timeout - затем DbAdmissionTimeout (503).
+    """
+
+    def __init__(
+        self,
+        capacity: int = POOL_SIZE + MAX_OVERFLOW,
+        bulk_share: float = settings.DB_GOVERNOR_BULK_SHARE,
+        wait_target: float = settings.DB_GOVERNOR_POOL_WAIT_TARGET,
+        acquire_timeout: float = settings.DB_GOVERNOR_ACQUIRE_TIMEOUT,
+    ):
+        self._capacity = capacity
+        self._max_bulk_limit = max(1, int(capacity * bulk_share))
+        self._wait_target = wait_target
+        self._acquire_timeout = acquire_timeout
+        self._bulk_limit = float(self._max_bulk_limit)
+        self._last_decrease = 0.0
+        self._lanes = {LANE_INTERACTIVE: LaneStats(), LANE_BULK: LaneStats()}
+        self._waiters: dict[str, deque[asyncio.Future]] = {
+            LANE_INTERACTIVE: deque(),
+            LANE_BULK: deque(),
+        }
+        self.pool_waits = 0
+        self.slow_pool_waits = 0
+
+    def _lane_limit(self, lane: str) -> int:
+        if lane == LANE_BULK:
+            return int(self._bulk_limit)
+        return self._capacity - 1
+
+    def _can_admit(self, lane: str) -> bool:
+        total = sum(stats.active for stats in self._lanes.values())
+        if total >= self._capacity:
+            return False
+        return self._lanes[lane].active < self._lane_limit(lane)
+
+    def _wake(self) -> None:
+        """Пустить ожидающих: сначала интерактивные, затем веерные"""
+        for lane in (LANE_INTERACTIVE, LANE_BULK):
+            waiters = self._waiters[lane]
+            while waiters and self._can_admit(lane):
+                waiter = waiters.popleft()
+                if waiter.done():
+                    continue
+                self._lanes[lane].active += 1
+                self._lanes[lane].waiting -= 1
+                waiter.set_result(None)
+
+    async def acquire(self, lane: str = LANE_INTERACTIVE) -> None:
+        """Дождаться места в полосе"""
+        stats = self._lanes[lane]
+        priority_waiting = lane == LANE_BULK and self._waiters[LANE_INTERACTIVE]
+        if not self._waiters[lane] and not priority_waiting and self._can_admit(lane):
+            stats.active += 1
+            stats.admitted += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[lane].append(waiter)
+        stats.waiting += 1
+        stats.max_waiting = max(stats.max_waiting, stats.waiting)
+        started = time.perf_counter()
+        try:
+            async with asyncio.timeout(self._acquire_timeout):
+                try:
+                    await waiter
+                except asyncio.CancelledError:
+                    if waiter.done() and not waiter.cancelled():
+                        # Место уже выдано - вернуть его
+                        self.release(lane)
+                    else:
+                        stats.waiting -= 1
+                        try:
+                            self._waiters[lane].remove(waiter)
+                        except ValueError:
+                            pass
+                    raise
+        except TimeoutError:
+            stats.timeouts += 1
+            raise DbAdmissionTimeout(lane)
+
+        stats.admitted += 1
+        stats.record_wait(time.perf_counter() - started)
+
+    def release(self, lane: str = LANE_INTERACTIVE) -> None:
+        """Освободить место в полосе"""
+        self._lanes[lane].active -= 1
+        self._wake()
+
+    def observe_pool_wait(self, seconds: float) -> None:
+        """Учесть ожидание подключения из пула и подстроить лимит веерных загрузок"""
+        self.pool_waits += 1
+        now = time.monotonic()
+
+        if seconds > self._wait_target:
+            self.slow_pool_waits += 1
+            # Не чаще раза в секунду, чтобы одна волна не обрушила лимит
+            if now - self._last_decrease >= 1.0:
+                self._bulk_limit = max(1.0, self._bulk_limit * 0.7)
+                self._last_decrease = now
+        else:
+            self._bulk_limit = min(
+                float(self._max_bulk_limit), self._bulk_limit + 1 / self._bulk_limit
+            )
+            self._wake()
+
+    @asynccontextmanager
+    async def session(
+        self, lane: str = LANE_INTERACTIVE, statement_timeout_ms: int | None = None
+    ):
+        """
+        Сессия под контролем допуска. Для веерных загрузок подключение
+        берется сразу, и время ожидания пула подстраивает лимит.
+        statement_timeout_ms - ограничение времени запросов в транзакции сессии
+        (после commit/rollback не действует).
+        Вложенная сессия задачи, уже держащей место, допускается сразу.
+        """
+        task = asyncio.current_task()
+        if _slot_holder.get() is task:
+            self._lanes[lane].reentered += 1
+            async with async_session_maker() as session:
+                await self._set_statement_timeout(session, statement_timeout_ms)
+                yield session
+            return
+
+        await self.acquire(lane)
+        # Без reset(token): выход из зависимости FastAPI может идти в другом контексте
+        previous = _slot_holder.get()
+        _slot_holder.set(task)
+        try:
+            async with async_session_maker() as session:
+                if lane == LANE_BULK:
+                    started = time.perf_counter()
+                    await session.connection()
+                    self.observe_pool_wait(time.perf_counter() - started)
+                await self._set_statement_timeout(session, statement_timeout_ms)
+                yield session
+        finally:
+            _slot_holder.set(previous)
+            self.release(lane)
+
+    @staticmethod
+    async def _set_statement_timeout(session, statement_timeout_ms: int | None):
+        if statement_timeout_ms:
+            await session.execute(
+                text(f"SET LOCAL statement_timeout = {int(statement_timeout_ms)}")
+            )
+
+    def stats(self) -> dict:
+        """Метрики допуска: лимиты, очереди по полосам, состояние пула"""
+        pool = engine.pool
+        return {
+            "capacity": self._capacity,
+            "lanes": {
+                lane: {**stats.as_dict(), "limit": self._lane_limit(lane)}
+                for lane, stats in self._lanes.items()
+            },
+            "pool_waits": self.pool_waits,
+            "slow_pool_waits": self.slow_pool_waits,
+            "pool_checked_out": pool.checkedout(),
+            "pool_size": pool.size(),
+        }
+
+
+# Глобальный контроль допуска (по одному в каждом воркере)
+db_governor = DbGovernor()
+
 
 class Base(AsyncAttrs, DeclarativeBase):
     pass
 
 
+# Есть ли в базе расширение pg_trgm (проверяется при запуске приложения)
+_trigram_available = True
+
+
+def trigram_available() -> bool:
+    """Можно ли использовать функции pg_trgm (similarity) в запросах"""
+    return _trigram_available
+
+
+def set_trigram_available(available: bool) -> None:
+    global _trigram_available
+    _trigram_available = available
+
+
+def trigram_index(name: str, column: str) -> Index:
+    """
+    GIN-индекс pg_trgm по колонке: поиск по подстроке (LIKE/ILIKE '%...%')
+    и ранжирование по похожести (нужно расширение pg_trgm)
+    """
+    return Index(
+        name,
+        column,
+        postgresql_using="gin",
+        postgresql_ops={column: "gin_trgm_ops"},
+        info={"trigram": True},
+    )
+
+
 async def get_db():
-    async with async_session_maker() as session:
+    async with db_governor.session(LANE_INTERACTIVE) as session:
         yield session
@@ -1,4 +1,4 @@
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, selectinload
 
 from myapp.models.equipment_malfunctions import Equipment
 from myapp.models.repair_case_equipment import RepairCaseEquipment
@@ -65,6 +65,50 @@ def load_detail_relations():
     return relations
 
 
+def select_detail_relations():
+    """
+    Те же связи, что в load_detail_relations, но отдельными запросами
+    по id (selectinload): для загрузки страницы уже отобранных случаев
+    без широкого JOIN на каждую строку
+    """
+    return [
+        selectinload(RepairCaseEquipment.regional_center),
+        selectinload(RepairCaseEquipment.locomotive_model),
+        selectinload(RepairCaseEquipment.fault_discovered_at),
+        selectinload(RepairCaseEquipment.component_equipment).selectinload(
+            Equipment.parent
+        ),
+        selectinload(RepairCaseEquipment.element_equipment).selectinload(
+            Equipment.parent
+        ),
+        selectinload(RepairCaseEquipment.malfunction),
+        selectinload(RepairCaseEquipment.new_component_equipment).selectinload(
+            Equipment.parent
+        ),
+        selectinload(RepairCaseEquipment.new_element_equipment).selectinload(
+            Equipment.parent
+        ),
+        selectinload(RepairCaseEquipment.repair_type),
+        selectinload(RepairCaseEquipment.performed_by),
+        selectinload(RepairCaseEquipment.equipment_owner),
+        selectinload(RepairCaseEquipment.destination),
+        selectinload(RepairCaseEquipment.supplier),
+        selectinload(RepairCaseEquipment.user),
+        selectinload(RepairCaseEquipment.locked_by),
+        selectinload(RepairCaseEquipment.warranty_work).options(
+            selectinload(WarrantyWork.notification_summary),
+            selectinload(WarrantyWork.response_summary),
+            selectinload(WarrantyWork.decision_summary),
+            selectinload(WarrantyWork.research_status),
+            selectinload(WarrantyWork.investigation_reason),
+        ),
+        selectinload(RepairCaseEquipment.waybill_doc).options(
+            selectinload(WaybillDoc.to_supplier_provider),
+            selectinload(WaybillDoc.from_supplier_provider),
+        ),
+    ]
+
+
 def load_warranty_relations():
     """Связи для загрузки данных рекламационной работы"""
     return [
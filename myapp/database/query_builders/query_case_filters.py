@@ -1,43 +1,85 @@
-from sqlalchemy import select, and_
+from sqlalchemy import select, and_, literal, tuple_
 from sqlalchemy.sql import expression
 
+from myapp.constants.filter_constants import TYPEAHEAD_FIELDS
 from myapp.database.query_builders.query_case_builders import load_detail_relations
 from myapp.models.waybill_docs import WaybillDoc
 from myapp.models.repair_case_equipment import RepairCaseEquipment
 from myapp.models.warranty_work import WarrantyWork
 from myapp.schemas.filters import CaseFilterParams
-from myapp.services.case_status_service import CaseStatusService
+from myapp.utils.filters_utils import escape_like, normalize_filter_value
+
+# Ключ условия по статусу (параметр status, фасет statuses)
+STATUS_FILTER_KEY = "status"
+
+
+def build_filter_condition(col, p_val) -> expression.ColumnElement | None:
+    """Условие по одному полю (None - значение не задано)"""
+    value = normalize_filter_value(p_val)
+    if value is None:
+        return None
+
+    if isinstance(value, list):
+        return col.in_(value)
+    return col == value
 
 
 def apply_filter_conditions(conditions: list, fields_mapping: list):
     for p_val, col in fields_mapping:
-        if p_val is None:
-            continue
+        condition = build_filter_condition(col, p_val)
+        if condition is not None:
+            conditions.append(condition)
 
-        if isinstance(p_val, list):
-            clean_list = [v for v in p_val if v is not None and str(v).strip() != ""]
-            if clean_list:
-                conditions.append(col.in_(clean_list))
-        else:
-            val_str = str(p_val).strip()
-            if val_str != "" and val_str.lower() != "none":
-                conditions.append(col == p_val)
 
+def build_substring_condition(col, fragment) -> expression.ColumnElement | None:
+    """Условие по фрагменту значения без учета регистра (по trigram-индексу)"""
+    value = normalize_filter_value(fragment)
+    if value is None:
+        return None
+    return col.ilike(f"%{escape_like(str(value).strip())}%", escape="\\")
 
-def build_repair_case_conditions(
+
+def apply_substring_conditions(conditions: list, fields_mapping: list):
+    for fragment, col in fields_mapping:
+        condition = build_substring_condition(col, fragment)
+        if condition is not None:
+            conditions.append(condition)
+
+
+def filter_field_key(col) -> str:
+    """Ключ поля фильтра: таблица и колонка"""
+    return f"{col.table.name}.{col.key}"
+
+
+def build_case_scope_conditions(
     params: CaseFilterParams,
 ) -> list[expression.ColumnElement]:
-    """Условия фильтрации для случая неисправности"""
+    """Условия, не относящиеся ни к одному фасету: период и секция"""
     conditions = []
 
-    # 1. Даты
     if params.date_from:
         conditions.append(RepairCaseEquipment.fault_date >= params.date_from)
     if params.date_to:
         conditions.append(RepairCaseEquipment.fault_date <= params.date_to)
 
-    # 2. Маппинг всех полей RepairCase
-    repair_fields = [
+    if params.section_mask is not None and params.section_mask != 0:
+        conditions.append(RepairCaseEquipment.section_mask == params.section_mask)
+
+    return conditions
+
+
+def build_status_condition(params: CaseFilterParams) -> expression.ColumnElement | None:
+    """Условие по статусу случая (хранимая колонка с индексом)"""
+    if params.status:
+        clean_statuses = [s for s in params.status if s]
+        if clean_statuses:
+            return RepairCaseEquipment.status.in_(clean_statuses)
+    return None
+
+
+def repair_case_filter_fields(params: CaseFilterParams) -> list[tuple]:
+    """Маппинг всех полей RepairCase: (значение параметра, колонка)"""
+    return [
         (params.regional_center_id, RepairCaseEquipment.regional_center_id),
         (params.locomotive_model_id, RepairCaseEquipment.locomotive_model_id),
         (params.component_equipment_id, RepairCaseEquipment.component_equipment_id),
@@ -77,28 +119,10 @@ def build_repair_case_conditions(
         (params.notes, RepairCaseEquipment.notes),
     ]
 
-    apply_filter_conditions(conditions, repair_fields)
-
-    # 3. Специфические поля
-    if params.section_mask is not None and params.section_mask != 0:
-        conditions.append(RepairCaseEquipment.section_mask == params.section_mask)
-
-    if params.status:
-        clean_statuses = [s for s in params.status if s]
-        if clean_statuses:
-            status_subquery = CaseStatusService.build_status_subquery()
-            conditions.append(status_subquery.in_(clean_statuses))
-
-    return conditions
-
-
-def build_warranty_work_conditions(
-    params: CaseFilterParams,
-) -> list[expression.ColumnElement]:
-    """Условия фильтрации для документов Рекламационной работы"""
-    conditions = []
 
-    warranty_fields = [
+def warranty_work_filter_fields(params: CaseFilterParams) -> list[tuple]:
+    """Маппинг полей Рекламационной работы: (значение параметра, колонка)"""
+    return [
         (params.notification_number, WarrantyWork.notification_number),
         (params.re_notification_number, WarrantyWork.re_notification_number),
         (params.response_letter_number, WarrantyWork.response_letter_number),
@@ -117,18 +141,10 @@ def build_warranty_work_conditions(
         (params.investigation_reason_id, WarrantyWork.investigation_reason_id),
     ]
 
-    apply_filter_conditions(conditions, warranty_fields)
 
-    return conditions
-
-
-def build_waybill_doc_conditions(
-    params: CaseFilterParams,
-) -> list[expression.ColumnElement]:
-    """Условия фильтрации для документов ТТН"""
-    conditions = []
-
-    waybill_fields = [
+def waybill_doc_filter_fields(params: CaseFilterParams) -> list[tuple]:
+    """Маппинг полей документов ТТН: (значение параметра, колонка)"""
+    return [
         # Номера ТТН
         (params.ttn_replacement, WaybillDoc.ttn_replacement),
         (params.ttn_from_rc, WaybillDoc.ttn_from_rc),
@@ -144,22 +160,101 @@ def build_waybill_doc_conditions(
         (params.from_supplier_provider_id, WaybillDoc.from_supplier_provider_id),
     ]
 
-    apply_filter_conditions(conditions, waybill_fields)
+
+def substring_filter_fields(params: CaseFilterParams) -> list[tuple]:
+    """Поиск по фрагменту номера: (фрагмент, колонка) для TYPEAHEAD_FIELDS"""
+    return [
+        (getattr(params, f"{name}_contains"), col)
+        for name, col in TYPEAHEAD_FIELDS.items()
+    ]
+
+
+def build_repair_case_conditions(
+    params: CaseFilterParams,
+) -> list[expression.ColumnElement]:
+    """Условия фильтрации для случая неисправности"""
+    conditions = build_case_scope_conditions(params)
+
+    apply_filter_conditions(conditions, repair_case_filter_fields(params))
+
+    status_condition = build_status_condition(params)
+    if status_condition is not None:
+        conditions.append(status_condition)
 
     return conditions
 
 
-def build_filtered_case_stmt(params: CaseFilterParams, include_status: bool = True):
-    """Сборка запроса для списка случаев и для экспорта"""
+def build_warranty_work_conditions(
+    params: CaseFilterParams,
+) -> list[expression.ColumnElement]:
+    """Условия фильтрации для документов Рекламационной работы"""
+    conditions = []
+    apply_filter_conditions(conditions, warranty_work_filter_fields(params))
+    return conditions
 
-    if include_status:
-        status_subquery = CaseStatusService.build_status_subquery()
-        stmt = select(RepairCaseEquipment, status_subquery)
-    else:
-        stmt = select(RepairCaseEquipment)
 
-    stmt = stmt.options(*load_detail_relations())
+def build_waybill_doc_conditions(
+    params: CaseFilterParams,
+) -> list[expression.ColumnElement]:
+    """Условия фильтрации для документов ТТН"""
+    conditions = []
+    apply_filter_conditions(conditions, waybill_doc_filter_fields(params))
+    return conditions
+
 
+def build_facet_filter_conditions(
+    params: CaseFilterParams,
+) -> tuple[list[expression.ColumnElement], dict[str, expression.ColumnElement]]:
+    """
+    Условия фильтрации для опций фильтров: общие (период, секция) и
+    условия по полям с ключом filter_field_key (статус - STATUS_FILTER_KEY).
+    Опции поля считаются по всем условиям, кроме условия самого поля.
+    """
+    field_conditions: dict[str, list] = {}
+
+    fields = (
+        repair_case_filter_fields(params)
+        + warranty_work_filter_fields(params)
+        + waybill_doc_filter_fields(params)
+    )
+    for p_val, col in fields:
+        condition = build_filter_condition(col, p_val)
+        if condition is not None:
+            field_conditions.setdefault(filter_field_key(col), []).append(condition)
+
+    # Фрагмент номера - условие того же поля, что и выбранные значения
+    for fragment, col in substring_filter_fields(params):
+        condition = build_substring_condition(col, fragment)
+        if condition is not None:
+            field_conditions.setdefault(filter_field_key(col), []).append(condition)
+
+    status_condition = build_status_condition(params)
+    if status_condition is not None:
+        field_conditions[STATUS_FILTER_KEY] = [status_condition]
+
+    return build_case_scope_conditions(params), {
+        key: and_(*conditions) for key, conditions in field_conditions.items()
+    }
+
+
+def case_order_columns(order_by: str) -> list:
+    """Колонки сортировки списка случаев (id делает порядок однозначным)"""
+    if order_by == "date_recorded":
+        return [RepairCaseEquipment.date_recorded, RepairCaseEquipment.id]
+    return [RepairCaseEquipment.id]
+
+
+def build_keyset_condition(
+    columns: list, values: list, after: bool
+) -> expression.ColumnElement:
+    """Строки после (after) или до ключа values по возрастанию columns"""
+    key = tuple_(*columns)
+    bound = tuple_(*(literal(value, col.type) for value, col in zip(values, columns)))
+    return key > bound if after else key < bound
+
+
+def apply_case_filters(stmt, params: CaseFilterParams):
+    """JOIN рекл. работы и ТТН и условия фильтрации для выборки случаев"""
     stmt = stmt.outerjoin(RepairCaseEquipment.warranty_work)
     stmt = stmt.outerjoin(RepairCaseEquipment.waybill_doc)
 
@@ -167,10 +262,34 @@ def build_filtered_case_stmt(params: CaseFilterParams, include_status: bool = Tr
     all_conditions.extend(build_repair_case_conditions(params))
     all_conditions.extend(build_warranty_work_conditions(params))
     all_conditions.extend(build_waybill_doc_conditions(params))
+    apply_substring_conditions(all_conditions, substring_filter_fields(params))
 
     if all_conditions:
         stmt = stmt.where(and_(*all_conditions))
 
+    return stmt
+
+
+def build_filtered_case_ids_stmt(params: CaseFilterParams):
+    """
+    Ключи сортировки подходящих случаев (id и дата регистрации) без
+    загрузки связей: по ним считается total и отбирается страница списка
+    """
+    stmt = select(RepairCaseEquipment.id, RepairCaseEquipment.date_recorded)
+    return apply_case_filters(stmt, params)
+
+
+def build_filtered_case_stmt(params: CaseFilterParams, include_status: bool = True):
+    """Сборка запроса для экспорта (случаи со всеми связями)"""
+
+    if include_status:
+        stmt = select(RepairCaseEquipment, RepairCaseEquipment.status)
+    else:
+        stmt = select(RepairCaseEquipment)
+
+    stmt = stmt.options(*load_detail_relations())
+    stmt = apply_case_filters(stmt, params)
+
     stmt = stmt.order_by(RepairCaseEquipment.date_recorded.asc())
 
     return stmt
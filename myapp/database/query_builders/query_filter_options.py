@@ -0,0 +1,262 @@
+from typing import Any
+
+from sqlalchemy import JSON, Integer, String, and_, any_, case, cast, distinct
+from sqlalchemy import false, func, literal, literal_column, select, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY, aggregate_order_by
+from sqlalchemy.sql import expression
+
+from myapp.database.query_builders.query_case_filters import (
+    STATUS_FILTER_KEY,
+    filter_field_key,
+)
+from myapp.models.repair_case_equipment import RepairCaseEquipment
+from myapp.models.warranty_work import WarrantyWork
+from myapp.models.waybill_docs import WaybillDoc
+from myapp.utils.filters_utils import escape_like
+
+# Название колонки со статусом в базовой выборке
+STATUS_FACET = "statuses"
+
+
+def facet_field_key(facet: dict) -> str:
+    """Ключ условия фильтрации, которое относится к самому фасету"""
+    if facet["name"] == STATUS_FACET:
+        return STATUS_FILTER_KEY
+    return filter_field_key(facet.get("fk_column", facet.get("column")))
+
+
+def facet_match_columns(base, facet: dict, facet_conditions: dict | None) -> list:
+    """Признаки выполнения условий всех полей, кроме поля самого фасета"""
+    own_key = facet_field_key(facet)
+    return [
+        base.c[f"match_{idx}"]
+        for idx, key in enumerate(facet_conditions or {})
+        if key != own_key
+    ]
+
+
+def build_filtered_base_cte(
+    facets: list[dict],
+    conditions: list[expression.ColumnElement] | None = None,
+    facet_conditions: dict[str, expression.ColumnElement] | None = None,
+):
+    """
+    Базовая выборка: случаи с рекл. работой и ТТН, отфильтрованные один раз.
+    Для каждого фасета берется одна колонка (значение или id справочника).
+
+    conditions применяются ко всем фасетам. Условия по полям
+    (facet_conditions) вычисляются в колонки-признаки match_N, чтобы каждый
+    фасет отбирал строки по всем условиям, кроме своего.
+    """
+    columns = []
+    for facet in facets:
+        if facet["name"] == STATUS_FACET:
+            columns.append(RepairCaseEquipment.status.label(STATUS_FACET))
+        else:
+            column = facet.get("fk_column", facet.get("column"))
+            columns.append(column.label(facet["name"]))
+
+    field_conditions = list((facet_conditions or {}).values())
+    for idx, condition in enumerate(field_conditions):
+        columns.append(func.coalesce(condition, false()).label(f"match_{idx}"))
+
+    stmt = (
+        select(*columns)
+        .select_from(RepairCaseEquipment)
+        .outerjoin(WarrantyWork, WarrantyWork.case_id == RepairCaseEquipment.id)
+        .outerjoin(WaybillDoc, WaybillDoc.case_id == RepairCaseEquipment.id)
+    )
+
+    if conditions:
+        stmt = stmt.where(and_(*conditions))
+
+    # Строка, не прошедшая два условия и больше, не попадет ни в один фасет
+    if len(field_conditions) > 1:
+        failed = sum(case((condition, 0), else_=1) for condition in field_conditions)
+        stmt = stmt.where(failed <= 1)
+
+    return stmt.cte("filtered_cases")
+
+
+def case_ids_condition(case_ids: list[int]) -> expression.ColumnElement:
+    """Случай из заданного набора id (один параметр-массив вместо IN)"""
+    return RepairCaseEquipment.id == any_(literal(case_ids, ARRAY(Integer)))
+
+
+def build_near_set_stmt(
+    conditions: list[expression.ColumnElement],
+    facet_conditions: dict[str, expression.ColumnElement],
+    case_ids: list[int] | None = None,
+):
+    """
+    id случаев базовой выборки, не прошедших не больше одного условия
+    по полям: только они могут попасть в опции какого-либо фасета.
+    case_ids - набор более широкого состояния фильтров, которым
+    ограничивается поиск.
+    """
+    if case_ids is not None:
+        conditions = conditions + [case_ids_condition(case_ids)]
+
+    base = build_filtered_base_cte(
+        [{"name": "case_id", "column": RepairCaseEquipment.id}],
+        conditions,
+        facet_conditions,
+    )
+    return select(base.c.case_id)
+
+
+def _values_aggregate(base, facet: dict, facet_conditions: dict | None = None):
+    """Отсортированный массив уникальных значений колонки"""
+    column = base.c[facet["name"]]
+    return (
+        select(
+            func.array_agg(
+                aggregate_order_by(distinct(column), column),
+                type_=ARRAY(column.type),
+            )
+        )
+        .where(column.isnot(None), *facet_match_columns(base, facet, facet_conditions))
+        .scalar_subquery()
+    )
+
+
+def _references_aggregate(base, facet: dict, facet_conditions: dict | None = None):
+    """Используемые элементы справочника в виде [{id, name}] по алфавиту"""
+    model = facet["model"]
+    name_column = facet["name_column"]
+    return (
+        select(
+            func.json_agg(
+                aggregate_order_by(
+                    func.json_build_object(
+                        literal_column("'id'"),
+                        model.id,
+                        literal_column("'name'"),
+                        name_column,
+                    ),
+                    name_column,
+                ),
+                type_=JSON,
+            )
+        )
+        .where(
+            model.id.in_(
+                select(base.c[facet["name"]]).where(
+                    *facet_match_columns(base, facet, facet_conditions)
+                )
+            )
+        )
+        .scalar_subquery()
+    )
+
+
+def build_filter_options_stmt(
+    facets: list[dict],
+    conditions: list[expression.ColumnElement] | None = None,
+    facet_conditions: dict[str, expression.ColumnElement] | None = None,
+):
+    """
+    Один запрос на все фасеты: выборка фильтруется один раз в CTE,
+    а каждый фасет - агрегат (array_agg / json_agg) по этой выборке
+    с учетом условий всех полей, кроме своего.
+    Результат - одна строка, колонки которой названы по фасетам.
+    """
+    base = build_filtered_base_cte(facets, conditions, facet_conditions)
+
+    aggregates = []
+    for facet in facets:
+        if "model" in facet:
+            aggregate = _references_aggregate(base, facet, facet_conditions)
+        else:
+            aggregate = _values_aggregate(base, facet, facet_conditions)
+        aggregates.append(aggregate.label(facet["name"]))
+
+    return select(*aggregates)
+
+
+def facet_source_table(facet: dict):
+    """Таблица, из которой берется значение фасета (статус - у случая)"""
+    if facet["name"] == STATUS_FACET:
+        return RepairCaseEquipment.__table__
+    return facet.get("fk_column", facet.get("column")).table
+
+
+def build_facet_counts_stmts(
+    facets: list[dict],
+    conditions: list[expression.ColumnElement] | None = None,
+    facet_conditions: dict[str, expression.ColumnElement] | None = None,
+) -> list[tuple[list[str], Any]]:
+    """
+    Запросы подсчета случаев по значениям фасетов: по одному на таблицу.
+    Каждый - GROUP BY GROUPING SETS по всем фасетам таблицы; колонка
+    grouping_mask показывает, к какому фасету относится строка
+    (сброшенный бит - сгруппированная колонка), а количество для фасета
+    берется из его колонки cases_N (по условиям всех полей, кроме своего).
+    """
+    by_table: dict[Any, list[dict]] = {}
+    for facet in facets:
+        by_table.setdefault(facet_source_table(facet), []).append(facet)
+
+    statements = []
+    for table_facets in by_table.values():
+        base = build_filtered_base_cte(table_facets, conditions, facet_conditions)
+        columns = [base.c[facet["name"]] for facet in table_facets]
+
+        counts = []
+        for idx, facet in enumerate(table_facets):
+            matches = facet_match_columns(base, facet, facet_conditions)
+            count = func.count()
+            if matches:
+                count = count.filter(and_(*matches))
+            counts.append(count.label(f"cases_{idx}"))
+
+        stmt = select(
+            *(cast(column, String).label(column.name) for column in columns),
+            func.grouping(*columns).label("grouping_mask"),
+            *counts,
+        ).group_by(func.grouping_sets(*(tuple_(column) for column in columns)))
+
+        statements.append(([facet["name"] for facet in table_facets], stmt))
+
+    return statements
+
+
+def build_typeahead_stmt(column, query: str, limit: int, use_similarity: bool = True):
+    """
+    Подсказки по фрагменту значения колонки: строки отбираются ILIKE
+    по trigram-индексу, списки через запятую разбиваются на значения.
+    Порядок: точное совпадение, совпадение с началом, похожесть
+    (similarity из pg_trgm; use_similarity=False - без нее, если
+    расширения нет), число случаев.
+    Результат - (value, count).
+    """
+    query = query.strip()
+    pattern = f"%{escape_like(query)}%"
+
+    tokens = (
+        select(
+            func.btrim(
+                func.unnest(func.string_to_array(column, literal(",", String)))
+            ).label("value")
+        )
+        .where(column.ilike(pattern, escape="\\"))
+        .subquery("typeahead_tokens")
+    )
+    value = tokens.c.value
+    lowered = func.lower(value)
+
+    order = [
+        (lowered == query.lower()).desc(),
+        lowered.like(f"{escape_like(query.lower())}%", escape="\\").desc(),
+    ]
+    if use_similarity:
+        order.append(func.similarity(value, query).desc())
+    order.extend([func.count().desc(), value])
+
+    return (
+        select(value, func.count().label("count"))
+        .where(value.ilike(pattern, escape="\\"))
+        .group_by(value)
+        .order_by(*order)
+        .limit(limit)
+    )
@@ -4,36 +4,140 @@ import logging
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import DBAPIError
 from typing import Any
 
 from myapp.config import settings
-from myapp.database.base import Base
+from myapp.database.base import Base, set_trigram_available
 from myapp.database.base import engine
 from myapp.api import api_router
+from myapp.services.cache_service import cache
+from myapp.services.cache_bus_service import invalidation_bus
+from myapp.services.cache_warmup_service import CacheWarmupService
+from myapp.services.case_status_service import CaseStatusService
+from myapp.services.facet_index_service import facet_index
+from myapp.services.filter_options_service import FilterOptionsService
 from scripts.openapi_fix import openapi_encoding_fix
 from myapp.debug_logger import setup_debug_logging
 
 
 # -ФУНКЦИЯ СОЗДАНИЯ ТАБЛИЦ -
+def create_missing_columns(conn) -> None:
+    """
+    Добавляет в существующие таблицы новые колонки моделей.
+    Только колонки, допускающие NULL: их можно добавить без значения
+    и заполнить отдельно.
+    """
+    existing_tables = set(inspect(conn).get_table_names())
+    preparer = conn.dialect.identifier_preparer
+
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {column["name"] for column in inspect(conn).get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable:
+                print(f"ОШИБКА: колонка {table.name}.{column.name} не добавлена")
+                continue
+            conn.execute(
+                text(
+                    f"ALTER TABLE {preparer.format_table(table)} "
+                    f"ADD COLUMN IF NOT EXISTS {preparer.format_column(column)} "
+                    f"{column.type.compile(dialect=conn.dialect)}"
+                )
+            )
+
+
+def skip_trigram_indexes() -> None:
+    """Убирает из моделей trigram-индексы (нет расширения pg_trgm)"""
+    for table in Base.metadata.sorted_tables:
+        for index in [index for index in table.indexes if index.info.get("trigram")]:
+            table.indexes.discard(index)
+
+
+async def ensure_trigram_extension(conn) -> bool:
+    """
+    Создает расширение pg_trgm в отдельной точке сохранения: если роли
+    нельзя создавать расширения, откатывается только эта команда,
+    а не вся транзакция создания схемы. Результат запоминается для
+    запросов подсказок (set_trigram_available).
+    """
+    try:
+        async with conn.begin_nested():
+            await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        installed = True
+    except DBAPIError as e:
+        print(f"ВНИМАНИЕ: расширение pg_trgm не создано. Подробнее {e}")
+        installed = await conn.scalar(
+            text("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')")
+        )
+
+    set_trigram_available(bool(installed))
+    return bool(installed)
+
+
+def create_missing_indexes(conn) -> None:
+    """Создает объявленные в моделях индексы, которых еще нет в базе"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
 async def create_db_and_tables() -> None:
     """Создает все таблицы в базе данных на основе Base"""
     try:
         async with engine.begin() as conn:
+            # pg_trgm нужен trigram-индексам поиска по фрагменту номера
+            # и ранжированию подсказок по похожести. Без него фильтры по
+            # фрагменту работают без индексов, а подсказки - без похожести
+            if not await ensure_trigram_extension(conn):
+                print("Trigram-индексы не создаются")
+                skip_trigram_indexes()
             await conn.run_sync(Base.metadata.create_all)
+            # create_all не добавляет новые колонки и индексы в уже существующие таблицы
+            await conn.run_sync(create_missing_columns)
+            await conn.run_sync(create_missing_indexes)
         print("Таблица создана")
     except Exception as e:
         print(f"ОШИБКА: таблица БД не создана. Подробнее {e}")
 
+    try:
+        await CaseStatusService.ensure_statuses_filled()
+    except Exception as e:
+        print(f"ОШИБКА: статусы случаев не заполнены. Подробнее {e}")
+
+    try:
+        await FilterOptionsService.ensure_facets_built()
+    except Exception as e:
+        print(f"ОШИБКА: таблица фасетов не заполнена. Подробнее {e}")
+
 
 # Контекстный менеджер
 @asynccontextmanager
 async def lifespan(_: FastAPI):
     print("Приложение запущено. Создание таблиц")
     await create_db_and_tables()
+    cache.start_sweeper()
+    invalidation_bus.start_listener()
+    if settings.FACET_INDEX_ENABLED:
+        try:
+            await facet_index.rebuild()
+        except Exception as e:
+            print(f"ОШИБКА: индекс фасетов не построен. Подробнее {e}")
+        facet_index.start_refresher()
+    if settings.CACHE_WARMUP_ENABLED:
+        await CacheWarmupService.warm_up()
 
     yield
 
     print("Приложение завершает работу")
+    await facet_index.stop_refresher()
+    await invalidation_bus.stop_listener()
+    await cache.stop_sweeper()
+    await cache.close()
 
 
 # - ИНИЦИАЛИЗАЦИЯ FASTAPI -
@@ -24,3 +24,5 @@ from .auxiliaries import (
     Supplier,
 )
 from .waybill_docs import WaybillDoc, ShippingProvider
+from .filter_facets import FilterFacet
+from .case_status_history import CaseStatusAge, CaseStatusTransition
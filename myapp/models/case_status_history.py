@@ -0,0 +1,44 @@
+from datetime import date, datetime
+
+from sqlalchemy import TIMESTAMP, BigInteger, Date, Index, Integer, String, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from myapp.database.base import Base
+
+
+class CaseStatusTransition(Base):
+    """
+    История смены статусов случаев (только добавление).
+    Пишется в транзакции изменения случая (см. CaseStatusService.refresh_status).
+    Внешнего ключа нет: история остается и после удаления случая.
+    """
+
+    __tablename__ = "case_status_transitions"
+
+    __table_args__ = (
+        Index("idx_case_status_transitions_case_id_at", "case_id", "at"),
+        Index("idx_case_status_transitions_to_status_at", "to_status", "at"),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    case_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    # None: случай только появился (from_status) или удален (to_status)
+    from_status: Mapped[str | None] = mapped_column(String(100))
+    to_status: Mapped[str | None] = mapped_column(String(100))
+    at: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True), nullable=False, server_default=func.now()
+    )
+
+
+class CaseStatusAge(Base):
+    """
+    Число случаев в статусе по дню, с которого они в нем находятся (UTC).
+    Сводка по статусам и срокам считается по этой таблице, размер которой
+    не зависит от числа случаев. Обновляется вместе с status_changed_at.
+    """
+
+    __tablename__ = "case_status_ages"
+
+    status: Mapped[str] = mapped_column(String(100), primary_key=True)
+    since: Mapped[date] = mapped_column(Date, primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
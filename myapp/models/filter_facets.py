@@ -0,0 +1,40 @@
+from sqlalchemy import Index, Integer, String, Text, func, literal_column
+from sqlalchemy.orm import Mapped, mapped_column
+
+from myapp.database.base import Base
+
+# Сколько первых символов значения попадает в индекс поиска по префиксу
+FACET_SEARCH_PREFIX_LENGTH = 200
+
+
+class FilterFacet(Base):
+    """
+    Значение опции фильтра и число случаев с ним.
+    Обновляется в транзакциях изменения случаев (см. FacetService)
+    """
+
+    __tablename__ = "filter_facets"
+
+    facet: Mapped[str] = mapped_column(String(64), primary_key=True)
+    # md5 от value: значения (например, примечания) могут быть длинными для индекса
+    value_key: Mapped[str] = mapped_column(String(32), primary_key=True)
+    value: Mapped[str] = mapped_column(Text, nullable=False)
+    count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+def facet_search_key(value):
+    """
+    Ключ поиска и сортировки значений фасета (без учета регистра).
+    Побайтовое сравнение (COLLATE "C") позволяет индексу обслуживать
+    и LIKE 'abc%', и ORDER BY.
+    """
+    prefix_length = literal_column(str(FACET_SEARCH_PREFIX_LENGTH))
+    return func.lower(func.left(value, prefix_length)).collate("C")
+
+
+# Постраничный поиск значений фасета по префиксу
+Index(
+    "idx_filter_facets_search",
+    FilterFacet.facet,
+    facet_search_key(FilterFacet.value),
+)
@@ -2,7 +2,7 @@ from sqlalchemy import Integer, String, Date, Text, ForeignKey, TIMESTAMP, text,
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from datetime import date, datetime
 
-from myapp.database.base import Base
+from myapp.database.base import Base, trigram_index
 
 
 # Основная таблица со случаями неисправности
@@ -22,6 +22,9 @@ class RepairCaseEquipment(Base):
             "new_component_equipment_id",
         ),
         Index("idx_repair_case_equipment_supplier_id", "supplier_id"),
+        Index("idx_repair_case_equipment_status", "status"),
+        # Постраничный вывод по курсору с сортировкой по дате регистрации
+        Index("idx_repair_case_equipment_date_recorded_id", "date_recorded", "id"),
         Index(
             "idx_unique_repair_case_core",
             "fault_date",
@@ -32,6 +35,26 @@ class RepairCaseEquipment(Base):
             unique=True,
             postgresql_nulls_not_distinct=True,
         ),
+        # Поиск по фрагменту номера локомотива и серийных номеров
+        trigram_index(
+            "idx_repair_case_equipment_locomotive_number_trgm", "locomotive_number"
+        ),
+        trigram_index(
+            "idx_repair_case_equipment_component_serial_old_trgm",
+            "component_serial_number_old",
+        ),
+        trigram_index(
+            "idx_repair_case_equipment_element_serial_old_trgm",
+            "element_serial_number_old",
+        ),
+        trigram_index(
+            "idx_repair_case_equipment_component_serial_new_trgm",
+            "component_serial_number_new",
+        ),
+        trigram_index(
+            "idx_repair_case_equipment_element_serial_new_trgm",
+            "element_serial_number_new",
+        ),
     )
 
     # Основные поля
@@ -57,6 +80,12 @@ class RepairCaseEquipment(Base):
     element_serial_number_new: Mapped[str | None] = mapped_column(String(100))
     element_manufacture_date_new: Mapped[str | None] = mapped_column(String(100))
 
+    # Статус (calculate_case_status), хранится для фильтров и списков:
+    # обновляется CaseStatusService.refresh_status при изменении случая
+    status: Mapped[str | None] = mapped_column(String(100))
+    # Когда статус стал текущим (для сроков в статусе)
+    status_changed_at: Mapped[datetime | None] = mapped_column(TIMESTAMP(timezone=True))
+
     # Внешние ключи
     regional_center_id: Mapped[int] = mapped_column(
         ForeignKey("regional_centers.id"), nullable=False
@@ -2,7 +2,7 @@ from sqlalchemy import Integer, String, Date, ForeignKey, Index
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from datetime import date
 
-from myapp.database.base import Base
+from myapp.database.base import Base, trigram_index
 
 
 class WarrantyWork(Base):
@@ -24,6 +24,21 @@ class WarrantyWork(Base):
         Index("idx_warranty_work_response_letter_date", "response_letter_date"),
         Index("idx_warranty_work_claim_act_date", "claim_act_date"),
         Index("idx_warranty_work_work_completion_act_date", "work_completion_act_date"),
+        # Поиск по фрагменту номера документа
+        trigram_index(
+            "idx_warranty_work_notification_number_trgm", "notification_number"
+        ),
+        trigram_index(
+            "idx_warranty_work_re_notification_number_trgm", "re_notification_number"
+        ),
+        trigram_index(
+            "idx_warranty_work_response_letter_number_trgm", "response_letter_number"
+        ),
+        trigram_index("idx_warranty_work_claim_act_number_trgm", "claim_act_number"),
+        trigram_index(
+            "idx_warranty_work_work_completion_act_number_trgm",
+            "work_completion_act_number",
+        ),
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
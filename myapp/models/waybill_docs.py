@@ -2,7 +2,7 @@ from sqlalchemy import Integer, Date, String, ForeignKey, Index
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from datetime import date
 
-from myapp.database.base import Base
+from myapp.database.base import Base, trigram_index
 
 
 class WaybillDoc(Base):
@@ -16,6 +16,11 @@ class WaybillDoc(Base):
         Index("idx_waybill_ttn_from_rc", "ttn_from_rc"),
         Index("idx_waybill_ttn_to_supplier", "ttn_to_supplier"),
         Index("idx_waybill_ttn_from_supplier", "ttn_from_supplier"),
+        # Поиск по фрагменту номера ТТН
+        trigram_index("idx_waybill_ttn_replacement_trgm", "ttn_replacement"),
+        trigram_index("idx_waybill_ttn_from_rc_trgm", "ttn_from_rc"),
+        trigram_index("idx_waybill_ttn_to_supplier_trgm", "ttn_to_supplier"),
+        trigram_index("idx_waybill_ttn_from_supplier_trgm", "ttn_from_supplier"),
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
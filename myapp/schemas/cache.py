@@ -0,0 +1,75 @@
+from pydantic import BaseModel
+
+
+class CacheKeyInfo(BaseModel):
+    """Запись кеша"""
+
+    key: str
+    size: int
+    expires_in: float
+    tags: list[str]
+
+
+class CacheStatsResponse(BaseModel):
+    """Счетчики эффективности пространства имен (с момента запуска воркера)"""
+
+    hits: int
+    stale_hits: int
+    misses: int
+    coalesced: int
+    evictions: int
+    invalidations: int
+    recomputes: int
+    recompute_seconds: float
+    max_recompute_seconds: float
+    avg_recompute_seconds: float
+    stored: int
+    last_entry_size: int
+    max_entry_size: int
+    hit_ratio: float
+
+
+class CacheNamespaceResponse(BaseModel):
+    """Пространство имен кеша: объем, лимиты, крупнейшие ключи и метрики"""
+
+    namespace: str
+    entries: int = 0
+    total_bytes: int = 0
+    max_entries: int | None = None
+    max_bytes: int | None = None
+    top_keys: list[CacheKeyInfo] = []
+    stats: CacheStatsResponse | None = None
+
+
+class CacheOverviewResponse(BaseModel):
+    """Состояние кеша воркера, обработавшего запрос"""
+
+    backend: str
+    worker_pid: int
+    namespaces: list[CacheNamespaceResponse]
+
+
+class DbLaneStatsResponse(BaseModel):
+    """Полоса допуска к БД: занятые места, очередь и ожидание"""
+
+    limit: int
+    active: int
+    waiting: int
+    max_waiting: int
+    admitted: int
+    queued: int
+    total_wait_seconds: float
+    max_wait_seconds: float
+    avg_wait_seconds: float
+
+
+class DbGovernorResponse(BaseModel):
+    """Контроль допуска к пулу БД воркера, обработавшего запрос"""
+
+    worker_pid: int
+    capacity: int
+    lanes: dict[str, DbLaneStatsResponse]
+    pool_waits: int
+    slow_pool_waits: int
+    pool_checked_out: int
+    pool_size: int
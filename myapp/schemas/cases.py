@@ -1,4 +1,4 @@
-from pydantic import BaseModel, ConfigDict
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field
 from datetime import date, datetime
 
 from .waybill import WaybillDocUpdate, WaybillDocResponse
@@ -110,7 +110,10 @@ class CaseCommonRelations(CaseOutputData):
     repair_type: AuxiliaryItem | None = None
     creator_full_name: str | None = None
 
-    status: str | None = None
+    # display_status - статус для вывода (с подставленным по умолчанию)
+    status: str | None = Field(
+        default=None, validation_alias=AliasChoices("display_status", "status")
+    )
 
     warranty_work: WarrantyWorkResponse | None = None
     waybill_doc: WaybillDocResponse | None = None
@@ -128,6 +131,10 @@ class PaginatedCaseListResponse(BaseModel):
     items: list[CaseList]
     total: int
 
+    # Только в режиме курсора (None - в эту сторону страниц нет)
+    next_cursor: str | None = None
+    prev_cursor: str | None = None
+
 
 class CaseDetail(CaseCommonRelations):
     """Схема для детального просмотра карточки"""
@@ -145,3 +152,29 @@ class SupplierPreviewRequest(BaseModel):
     equipment_id: int | None
     locomotive_number: str | None
     locomotive_model_id: int | None
+
+
+class StatusAgeBucket(BaseModel):
+    """Случаи, находящиеся в статусе от min_days до max_days дней (не включая)"""
+
+    min_days: int
+    max_days: int | None = None
+    count: int = 0
+
+
+class StatusDashboardItem(BaseModel):
+    """Сводка по одному статусу"""
+
+    status: str
+    total: int = 0
+    # В статусе дольше older_than_days дней
+    older_than: int = 0
+    buckets: list[StatusAgeBucket] = Field(default_factory=list)
+
+
+class StatusDashboardResponse(BaseModel):
+    """Число случаев по статусам и срокам нахождения в статусе"""
+
+    older_than_days: int
+    total: int
+    items: list[StatusDashboardItem]
@@ -1,6 +1,11 @@
+import hashlib
+import json
 from pydantic import BaseModel
 from pydantic import Field
 from datetime import date
+from typing import ClassVar, Literal
+
+from myapp.utils.filters_utils import normalize_filter_value
 from .references import AuxiliaryItem, RepairTypeItem
 
 
@@ -57,10 +62,50 @@ class FilterOptionsResponse(BaseModel):
     ttn_to_supplier_dates: list[date] = Field(default_factory=list)
     ttn_from_supplier_dates: list[date] = Field(default_factory=list)
 
+    # Число подходящих случаев: фасет -> значение (для справочников - id) -> кол-во
+    facet_counts: dict[str, dict[str, int]] = Field(default_factory=dict)
+
+    # Неполный ответ: часть фасетов (или количества) не успела посчитаться
+    degraded: bool = False
+    degraded_facets: list[str] = Field(default_factory=list)
+
+
+class FacetValueItem(BaseModel):
+    """Значение фасета и число случаев с ним"""
+
+    value: str
+    count: int
+
+
+class FacetValuesResponse(BaseModel):
+    """Страница значений одного фасета"""
+
+    facet: str
+    items: list[FacetValueItem]
+    # Передается в cursor для следующей страницы (None - страниц больше нет)
+    next_cursor: str | None = None
+
+
+class TypeaheadResponse(BaseModel):
+    """Подсказки по фрагменту номера: сначала точные и по началу, затем похожие"""
+
+    field: str
+    items: list[FacetValueItem]
+
 
 class CaseFilterParams(BaseModel):
     """Параметры фильтрации: ПО ВСЕМ ПОЛЯМ (кроме кол-ва и дат пр-ва оборудования)"""
 
+    # Поля, не влияющие на набор отфильтрованных случаев
+    PAGINATION_FIELDS: ClassVar[set[str]] = {
+        "skip",
+        "limit",
+        "sort_order",
+        "order_by",
+        "cursor_mode",
+        "cursor",
+    }
+
     skip: int = 0
     limit: int = 50
 
@@ -69,6 +114,14 @@ class CaseFilterParams(BaseModel):
     date_to: date | None = None
     sort_order: str = "desc"
 
+    # Сортировка списка: по id или по дате регистрации (затем по id)
+    order_by: Literal["id", "date_recorded"] = "id"
+
+    # Постраничный вывод по курсору вместо skip: любая страница стоит
+    # как первая. cursor - next_cursor / prev_cursor прошлого ответа
+    cursor_mode: bool = False
+    cursor: str | None = None
+
     # Идентификаторы (RepairCaseEquipment)
     regional_center_id: list[int] | None = None
     locomotive_model_id: list[int] | None = None
@@ -132,3 +185,68 @@ class CaseFilterParams(BaseModel):
 
     to_supplier_provider_id: list[int] | None = None
     from_supplier_provider_id: list[int] | None = None
+
+    # --- Поиск по фрагменту номера (TYPEAHEAD_FIELDS, без учета регистра) ---
+    locomotive_number_contains: str | None = None
+    component_serial_number_old_contains: str | None = None
+    element_serial_number_old_contains: str | None = None
+    component_serial_number_new_contains: str | None = None
+    element_serial_number_new_contains: str | None = None
+    notification_number_contains: str | None = None
+    re_notification_number_contains: str | None = None
+    response_letter_number_contains: str | None = None
+    claim_act_number_contains: str | None = None
+    work_completion_act_number_contains: str | None = None
+    ttn_replacement_contains: str | None = None
+    ttn_from_rc_contains: str | None = None
+    ttn_to_supplier_contains: str | None = None
+    ttn_from_supplier_contains: str | None = None
+
+    def canonical_filters(self) -> dict:
+        """
+        Только заданные условия в нормализованном виде: пустые значения
+        отброшены так же, как в apply_filter_conditions, списки отсортированы
+        """
+        canonical = {}
+        dumped = self.model_dump(mode="json", exclude=self.PAGINATION_FIELDS)
+
+        for name, value in dumped.items():
+            value = normalize_filter_value(value)
+            if value is None:
+                continue
+
+            # Нулевая маска секции означает "любая секция"
+            if name == "section_mask" and value == 0:
+                continue
+
+            if isinstance(value, list):
+                value = sorted(set(value))
+
+            canonical[name] = value
+
+        return canonical
+
+    @staticmethod
+    def _fingerprint_of(canonical: dict) -> str:
+        payload = json.dumps(
+            canonical,
+            sort_keys=True,
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def fingerprint(self) -> str:
+        """Стабильный отпечаток состояния фильтров (одинаков между процессами)"""
+        return self._fingerprint_of(self.canonical_filters())
+
+    def parent_fingerprints(self) -> list[str]:
+        """
+        Отпечатки состояний без одного из условий: каждое из них шире
+        текущего, и текущее получается из него добавлением одного условия
+        """
+        canonical = self.canonical_filters()
+        return [
+            self._fingerprint_of({k: v for k, v in canonical.items() if k != name})
+            for name in canonical
+        ]
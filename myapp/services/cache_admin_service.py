@@ -0,0 +1,35 @@
+import os
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from myapp.database.base import db_governor
+from myapp.services.cache_bus_service import invalidation_bus
+from myapp.services.cache_service import cache
+
+
+class CacheAdminService:
+
+    @staticmethod
+    async def get_overview(top_keys: int = 10) -> dict:
+        """Состояние кеша и метрики @cached по пространствам имен"""
+        namespaces = {ns["namespace"]: ns for ns in await cache.describe(top_keys)}
+
+        # Метрики есть и у пространств, которые сейчас пусты
+        for name, stats in cache.all_stats().items():
+            namespaces.setdefault(name, {"namespace": name})["stats"] = stats.as_dict()
+
+        return {
+            "backend": type(cache).__name__,
+            "worker_pid": os.getpid(),
+            "namespaces": sorted(namespaces.values(), key=lambda ns: ns["namespace"]),
+        }
+
+    @staticmethod
+    async def purge_namespace(session: AsyncSession, namespace: str) -> None:
+        """Очистить пространство имен во всех воркерах"""
+        await invalidation_bus.purge_namespace(session, namespace)
+
+    @staticmethod
+    def get_db_governor_stats() -> dict:
+        """Метрики контроля допуска к пулу БД текущего воркера"""
+        return {"worker_pid": os.getpid(), **db_governor.stats()}
@@ -0,0 +1,211 @@
+import asyncio
+import logging
+import sys
+import time
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass
+from typing import Any, Dict
+
+from myapp.config import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NAMESPACE = "default"
+
+
+def estimate_size(value: Any, _seen: set[int] | None = None) -> int:
+    """Приблизительный размер значения в байтах (с учетом вложенных объектов)"""
+    if _seen is None:
+        _seen = set()
+
+    obj_id = id(value)
+    if obj_id in _seen:
+        return 0
+    _seen.add(obj_id)
+
+    size = sys.getsizeof(value)
+
+    if isinstance(value, dict):
+        size += sum(
+            estimate_size(k, _seen) + estimate_size(v, _seen) for k, v in value.items()
+        )
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item, _seen) for item in value)
+    elif hasattr(value, "__dict__"):
+        size += estimate_size(vars(value), _seen)
+
+    return size
+
+
+@dataclass(frozen=True, slots=True)
+class CacheEntry:
+    """Неизменяемая запись кеша: при обновлении заменяется целиком"""
+
+    value: Any
+    expires: float
+    size: int
+    # До этого момента запись можно отдавать устаревшей (stale-while-revalidate)
+    stale_until: float = 0.0
+    # Таблицы, при изменении которых запись становится недействительной
+    tags: frozenset[str] = frozenset()
+
+    @property
+    def is_fresh(self) -> bool:
+        return time.time() < self.expires
+
+    @property
+    def keep_until(self) -> float:
+        return max(self.expires, self.stale_until)
+
+
+@dataclass(slots=True)
+class CacheStats:
+    """Счетчики эффективности кеша по пространству имен (в пределах воркера)"""
+
+    hits: int = 0
+    stale_hits: int = 0
+    misses: int = 0
+    # Промахи, дождавшиеся уже идущего вычисления вместо своего
+    coalesced: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+    recomputes: int = 0
+    recompute_seconds: float = 0.0
+    max_recompute_seconds: float = 0.0
+    stored: int = 0
+    last_entry_size: int = 0
+    max_entry_size: int = 0
+
+    def record_recompute(self, seconds: float) -> None:
+        self.recomputes += 1
+        self.recompute_seconds += seconds
+        self.max_recompute_seconds = max(self.max_recompute_seconds, seconds)
+
+    def record_store(self, size: int) -> None:
+        self.stored += 1
+        self.last_entry_size = size
+        self.max_entry_size = max(self.max_entry_size, size)
+
+    def as_dict(self) -> dict:
+        data = asdict(self)
+        lookups = self.hits + self.stale_hits + self.misses
+        data["hit_ratio"] = (self.hits + self.stale_hits) / lookups if lookups else 0.0
+        data["avg_recompute_seconds"] = (
+            self.recompute_seconds / self.recomputes if self.recomputes else 0.0
+        )
+        return data
+
+
+class CacheBackend(ABC):
+    """
+    Интерфейс хранилища кеша.
+    Реализации: SimpleCache (в памяти процесса) и SharedCache (общий файл
+    SQLite для всех воркеров на хосте).
+    """
+
+    def __init__(self):
+        self._sweeper_task: asyncio.Task | None = None
+        self._stats: Dict[str, CacheStats] = {}
+
+    def stats(self, namespace: str) -> CacheStats:
+        """Счетчики пространства имен (создаются при первом обращении)"""
+        stats = self._stats.get(namespace)
+        if stats is None:
+            stats = self._stats[namespace] = CacheStats()
+        return stats
+
+    def all_stats(self) -> Dict[str, CacheStats]:
+        """Счетчики всех пространств имен"""
+        return dict(self._stats)
+
+    @abstractmethod
+    def configure_namespace(
+        self,
+        namespace: str,
+        max_entries: int | None = None,
+        max_bytes: int | None = None,
+    ) -> None:
+        """Задать ограничения для пространства имен"""
+
+    @abstractmethod
+    async def tag_versions(self, tags) -> Dict[str, int]:
+        """Текущие версии тегов (снимок перед началом вычисления)"""
+
+    @abstractmethod
+    async def get(self, key: str, namespace: str = DEFAULT_NAMESPACE) -> Any | None:
+        """Получить свежее значение из кеша"""
+
+    @abstractmethod
+    async def get_entry(
+        self, key: str, namespace: str = DEFAULT_NAMESPACE
+    ) -> CacheEntry | None:
+        """Получить запись целиком, в том числе устаревшую в пределах stale-окна"""
+
+    @abstractmethod
+    async def set(
+        self,
+        key: str,
+        value: Any,
+        ttl_seconds: int = 300,
+        namespace: str = DEFAULT_NAMESPACE,
+        stale_ttl_seconds: int = 0,
+        tags=(),
+        versions: Dict[str, int] | None = None,
+    ):
+        """
+        Сохранить значение в кеш.
+        versions - снимок версий тегов на момент начала вычисления: если теги
+        успели инвалидировать, значение считается устаревшим и не сохраняется.
+        """
+
+    @abstractmethod
+    async def delete(self, key: str, namespace: str = DEFAULT_NAMESPACE):
+        """Удалить конкретный ключ из кэша"""
+
+    @abstractmethod
+    async def clear(self, namespace: str | None = None):
+        """Очистить кеш (целиком или одно пространство имен)"""
+
+    @abstractmethod
+    async def invalidate_tags(self, *tags: str) -> int:
+        """Удалить записи, зависящие от любого из тегов, возвращает их количество"""
+
+    @abstractmethod
+    async def sweep_expired(self) -> int:
+        """Удалить все просроченные записи, возвращает количество удаленных"""
+
+    @abstractmethod
+    async def describe(self, top_keys: int = 10) -> list[dict]:
+        """
+        Состояние пространств имен: число записей, объем, лимиты
+        и самые крупные ключи
+        """
+
+    async def close(self):
+        """Освободить ресурсы хранилища"""
+
+    async def _sweep_loop(self, interval_seconds: int):
+        """Фоновая очистка просроченных записей"""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                removed = await self.sweep_expired()
+                if removed:
+                    logger.debug(f"Кеш: удалено просроченных записей: {removed}")
+            except Exception as e:
+                logger.error(f"Ошибка фоновой очистки кеша: {e}")
+
+    def start_sweeper(self, interval_seconds: int = settings.CACHE_SWEEP_INTERVAL):
+        """Запустить фоновую очистку (вызывается в lifespan приложения)"""
+        if self._sweeper_task is None or self._sweeper_task.done():
+            self._sweeper_task = asyncio.create_task(self._sweep_loop(interval_seconds))
+
+    async def stop_sweeper(self):
+        """Остановить фоновую очистку"""
+        if self._sweeper_task is not None:
+            self._sweeper_task.cancel()
+            try:
+                await self._sweeper_task
+            except asyncio.CancelledError:
+                pass
+            self._sweeper_task = None
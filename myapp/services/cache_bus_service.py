@@ -0,0 +1,181 @@
+import asyncio
+import json
+import logging
+
+import asyncpg
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from myapp.config import settings
+from myapp.constants.cache_tags import CASE_TAGS
+from myapp.services.cache_service import cache
+from myapp.services.facet_index_service import facet_index
+
+logger = logging.getLogger(__name__)
+
+# Пауза перед повторным подключением слушателя после обрыва
+RECONNECT_DELAY_SECONDS = 5
+
+# Полезная нагрузка NOTIFY - меньше 8000 байт: id случаев (до 12 символов
+# с разделителем) отправляются частями
+NOTIFY_CASES_CHUNK = 500
+
+# Больше измененных случаев - воркеры перестраивают индекс фасетов целиком
+NOTIFY_CASES_REBUILD_THRESHOLD = 5000
+
+
+class CacheInvalidationBus:
+    """
+    Шина инвалидации кеша между воркерами на LISTEN/NOTIFY PostgreSQL.
+    Писатели публикуют теги в своей транзакции: PostgreSQL доставляет
+    уведомление только после COMMIT (и не доставляет при откате),
+    а слушатель каждого воркера удаляет зависящие от тегов записи.
+    """
+
+    def __init__(self, channel: str = settings.CACHE_INVALIDATION_CHANNEL):
+        self._channel = channel
+        self._listener_task: asyncio.Task | None = None
+        self._pending: set[asyncio.Task] = set()
+
+    async def publish(self, session: AsyncSession, *tags: str) -> None:
+        """
+        Инвалидировать теги в текущем воркере сразу,
+        а в остальных - после фиксации транзакции сессии
+        """
+        if not tags:
+            return
+
+        await cache.invalidate_tags(*tags)
+        await session.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": self._channel, "payload": json.dumps({"tags": tags})},
+        )
+
+    async def publish_cases(self, session: AsyncSession, *case_ids: int) -> None:
+        """
+        Сообщить всем воркерам (включая текущий) об изменении случаев:
+        индекс фасетов перечитает их после фиксации транзакции.
+        Много случаев - одно уведомление о полном перестроении индекса.
+        """
+        case_ids = sorted(set(case_ids))
+        if not case_ids:
+            return
+
+        if len(case_ids) > NOTIFY_CASES_REBUILD_THRESHOLD:
+            payloads = [{"rebuild": True}]
+        else:
+            payloads = [
+                {"cases": case_ids[start : start + NOTIFY_CASES_CHUNK]}
+                for start in range(0, len(case_ids), NOTIFY_CASES_CHUNK)
+            ]
+
+        for payload in payloads:
+            await session.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": self._channel, "payload": json.dumps(payload)},
+            )
+
+    async def purge_namespace(self, session: AsyncSession, namespace: str) -> None:
+        """Очистить пространство имен кеша во всех воркерах"""
+        await cache.clear(namespace)
+        await session.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {
+                "channel": self._channel,
+                "payload": json.dumps({"namespace": namespace}),
+            },
+        )
+        await session.commit()
+
+    def _on_notification(self, _conn, _pid: int, _channel: str, payload: str):
+        """Обработчик уведомления (вызывается asyncpg синхронно)"""
+        try:
+            message = json.loads(payload)
+            if "namespace" in message:
+                action = cache.clear(str(message["namespace"]))
+            elif "rebuild" in message:
+                if not facet_index.ready:
+                    return
+                action = facet_index.rebuild()
+            elif "cases" in message:
+                # Список, а не генератор: ошибка разбора - здесь, а не в задаче
+                case_ids = [int(i) for i in message["cases"]]
+                action = facet_index.refresh_cases(case_ids)
+            else:
+                tags = message["tags"]
+                if not set(tags) <= set(CASE_TAGS):
+                    facet_index.invalidate_names()
+                action = cache.invalidate_tags(*tags)
+        except (ValueError, KeyError, TypeError):
+            logger.warning(f"Некорректное уведомление об инвалидации: {payload!r}")
+            return
+
+        self._run_in_background(action)
+
+    def _run_in_background(self, action) -> None:
+        """Выполнить корутину в фоне, не теряя ссылку на задачу"""
+        task = asyncio.get_running_loop().create_task(action)
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _listen_loop(self):
+        """Держит подключение с LISTEN и переподключается при обрыве"""
+        reconnect = False
+
+        while True:
+            try:
+                conn = await asyncpg.connect(
+                    user=settings.DB_USER,
+                    password=settings.DB_PASSWORD,
+                    host=settings.DB_HOST,
+                    port=settings.DB_PORT,
+                    database=settings.DB_NAME,
+                )
+            except Exception as e:
+                logger.error(f"Слушатель инвалидации кеша не подключился: {e}")
+                await asyncio.sleep(RECONNECT_DELAY_SECONDS)
+                continue
+
+            try:
+                lost = asyncio.Event()
+                conn.add_termination_listener(lambda _: lost.set())
+                await conn.add_listener(self._channel, self._on_notification)
+
+                # Пока подключения не было, уведомления могли потеряться
+                if reconnect:
+                    await cache.clear()
+                    if facet_index.ready:
+                        self._run_in_background(facet_index.rebuild())
+                reconnect = True
+
+                logger.info(f"Слушатель инвалидации кеша подписан на {self._channel}")
+                await lost.wait()
+                logger.warning("Слушатель инвалидации кеша потерял подключение")
+            except Exception as e:
+                logger.error(f"Ошибка слушателя инвалидации кеша: {e}")
+            finally:
+                if not conn.is_closed():
+                    await conn.close()
+
+            await asyncio.sleep(RECONNECT_DELAY_SECONDS)
+
+    def start_listener(self):
+        """Запустить слушателя уведомлений (один на воркер)"""
+        if self._listener_task is None or self._listener_task.done():
+            self._listener_task = asyncio.create_task(self._listen_loop())
+
+    async def stop_listener(self):
+        """Остановить слушателя уведомлений"""
+        if self._listener_task is None:
+            return
+
+        self._listener_task.cancel()
+        try:
+            await self._listener_task
+        except asyncio.CancelledError:
+            pass
+        self._listener_task = None
+
+
+# Глобальная шина инвалидации
+invalidation_bus = CacheInvalidationBus()
@@ -1,70 +1,464 @@
 import asyncio
+import hashlib
+import inspect
+import json
+import logging
 import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
 from typing import Any, Dict
 from functools import wraps
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from myapp.config import settings
+from myapp.services.cache_backend import (
+    DEFAULT_NAMESPACE,
+    CacheBackend,
+    CacheEntry,
+    estimate_size,
+)
+from myapp.services.shared_cache_service import SharedCache
 
-class SimpleCache:
-    """in-memory кеш для статических данных"""
+logger = logging.getLogger(__name__)
 
-    def __init__(self):
-        self._cache: Dict[str, Dict[str, Any]] = {}
+
+@dataclass
+class CacheNamespace:
+    """Пространство имен кеша со своими ограничениями по объему"""
+
+    max_entries: int
+    max_bytes: int
+    entries: OrderedDict[str, CacheEntry] = field(default_factory=OrderedDict)
+    total_bytes: int = 0
+
+
+class SimpleCache(CacheBackend):
+    """
+    in-memory LRU/TTL кеш для статических данных.
+    Чтение выполняется без блокировки: записи неизменяемы и подменяются
+    атомарно, а между await-точками цикл событий не переключает корутины.
+    Блокировка сериализует только операции записи.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = settings.CACHE_MAX_ENTRIES,
+        max_bytes: int = settings.CACHE_MAX_BYTES,
+    ):
+        super().__init__()
+        self._default_max_entries = max_entries
+        self._default_max_bytes = max_bytes
+        self._namespaces: Dict[str, CacheNamespace] = {}
+        # Тег -> ключи записей (namespace, key), зависящих от него
+        self._tag_index: Dict[str, set[tuple[str, str]]] = {}
+        # Версии тегов растут при каждой инвалидации
+        self._tag_versions: Dict[str, int] = {}
         self._lock = asyncio.Lock()
 
-    async def get(self, key: str) -> Any | None:
-        """Получить значение из кеша"""
-        async with self._lock:
-            if key in self._cache:
-                item = self._cache[key]
-                if time.time() < item["expires"]:
-                    return item["value"]
-                else:
-                    del self._cache[key]
+    def configure_namespace(
+        self,
+        namespace: str,
+        max_entries: int | None = None,
+        max_bytes: int | None = None,
+    ) -> CacheNamespace:
+        """Задать ограничения для пространства имен (создает его при отсутствии)"""
+        ns = self._namespaces.get(namespace)
+        if ns is None:
+            ns = CacheNamespace(
+                max_entries=max_entries or self._default_max_entries,
+                max_bytes=max_bytes or self._default_max_bytes,
+            )
+            self._namespaces[namespace] = ns
+        else:
+            if max_entries:
+                ns.max_entries = max_entries
+            if max_bytes:
+                ns.max_bytes = max_bytes
+        return ns
+
+    def _unindex(self, namespace: str, key: str, item: CacheEntry) -> None:
+        """Убрать запись из индекса тегов"""
+        for tag in item.tags:
+            refs = self._tag_index.get(tag)
+            if refs is not None:
+                refs.discard((namespace, key))
+                if not refs:
+                    del self._tag_index[tag]
+
+    def _remove(self, namespace: str, key: str) -> None:
+        """Удалить запись из пространства имен с учетом занятого объема"""
+        ns = self._namespaces.get(namespace)
+        if ns is None:
+            return
+
+        item = ns.entries.pop(key, None)
+        if item is not None:
+            ns.total_bytes -= item.size
+            self._unindex(namespace, key, item)
+
+    def _evict(self, namespace: str) -> None:
+        """Вытеснить давно неиспользуемые записи, пока не уложимся в лимиты"""
+        ns = self._namespaces[namespace]
+        while ns.entries and (
+            len(ns.entries) > ns.max_entries or ns.total_bytes > ns.max_bytes
+        ):
+            key, item = ns.entries.popitem(last=False)
+            ns.total_bytes -= item.size
+            self._unindex(namespace, key, item)
+            self.stats(namespace).evictions += 1
+
+    def _current_versions(self, tags) -> Dict[str, int]:
+        return {tag: self._tag_versions.get(tag, 0) for tag in tags}
+
+    async def tag_versions(self, tags) -> Dict[str, int]:
+        """Текущие версии тегов (снимок перед началом вычисления)"""
+        return self._current_versions(tags)
+
+    async def get(self, key: str, namespace: str = DEFAULT_NAMESPACE) -> Any | None:
+        """Получить значение из кеша (без блокировки)"""
+        ns = self._namespaces.get(namespace)
+        if ns is None:
+            return None
+
+        item = ns.entries.get(key)
+        if item is None or not item.is_fresh:
+            # Просроченные записи удаляет фоновая очистка или следующая запись
+            return None
+
+        ns.entries.move_to_end(key)
+        return item.value
+
+    async def get_entry(
+        self, key: str, namespace: str = DEFAULT_NAMESPACE
+    ) -> CacheEntry | None:
+        """Получить запись целиком, в том числе устаревшую в пределах stale-окна"""
+        ns = self._namespaces.get(namespace)
+        if ns is None:
+            return None
+
+        item = ns.entries.get(key)
+        if item is None or time.time() >= item.keep_until:
             return None
 
-    async def set(self, key: str, value: Any, ttl_seconds: int = 300):
-        """Сохранить значение в кеш"""
+        ns.entries.move_to_end(key)
+        return item
+
+    async def set(
+        self,
+        key: str,
+        value: Any,
+        ttl_seconds: int = 300,
+        namespace: str = DEFAULT_NAMESPACE,
+        stale_ttl_seconds: int = 0,
+        tags=(),
+        versions: Dict[str, int] | None = None,
+    ):
+        """
+        Сохранить значение в кеш.
+        versions - снимок версий тегов на момент начала вычисления: если теги
+        успели инвалидировать, значение считается устаревшим и не сохраняется.
+        """
+        size = estimate_size(value)
+
+        async with self._lock:
+            if versions is not None and versions != self._current_versions(versions):
+                return
+
+            ns = self.configure_namespace(namespace)
+
+            if size > ns.max_bytes:
+                logger.warning(
+                    f"Значение {namespace}:{key} ({size} байт) больше лимита "
+                    f"пространства имен ({ns.max_bytes} байт), не кешируется"
+                )
+                return
+
+            self._remove(namespace, key)
+            expires = time.time() + ttl_seconds
+            item = CacheEntry(
+                value=value,
+                expires=expires,
+                size=size,
+                stale_until=expires + stale_ttl_seconds,
+                tags=frozenset(tags),
+            )
+            ns.entries[key] = item
+            ns.total_bytes += size
+            for tag in item.tags:
+                self._tag_index.setdefault(tag, set()).add((namespace, key))
+            self.stats(namespace).record_store(size)
+            self._evict(namespace)
+
+    async def clear(self, namespace: str | None = None):
+        """Очистить кеш (целиком или одно пространство имен)"""
         async with self._lock:
-            self._cache[key] = {"value": value, "expires": time.time() + ttl_seconds}
+            if namespace is None:
+                targets = list(self._namespaces)
+            else:
+                targets = [namespace] if namespace in self._namespaces else []
+
+            for name in targets:
+                for key in list(self._namespaces[name].entries):
+                    self._remove(name, key)
+
+    async def invalidate_tags(self, *tags: str) -> int:
+        """Удалить записи, зависящие от любого из тегов, возвращает их количество"""
+        removed = 0
 
-    async def clear(self):
-        """Очистить кеш"""
         async with self._lock:
-            self._cache.clear()
+            for tag in tags:
+                self._tag_versions[tag] = self._tag_versions.get(tag, 0) + 1
+                for namespace, key in list(self._tag_index.get(tag, ())):
+                    self._remove(namespace, key)
+                    self.stats(namespace).invalidations += 1
+                    removed += 1
 
-    async def delete(self, key: str):
+        return removed
+
+    async def delete(self, key: str, namespace: str = DEFAULT_NAMESPACE):
         """Удалить конкретный ключ из кэша"""
         async with self._lock:
-            if key in self._cache:
-                del self._cache[key]
+            self._remove(namespace, key)
+
+    async def sweep_expired(self) -> int:
+        """Удалить все просроченные записи, возвращает количество удаленных"""
+        now = time.time()
+        removed = 0
+
+        async with self._lock:
+            for name, ns in self._namespaces.items():
+                expired = [
+                    k for k, item in ns.entries.items() if item.keep_until <= now
+                ]
+                for key in expired:
+                    self._remove(name, key)
+                removed += len(expired)
+
+        return removed
+
+    async def describe(self, top_keys: int = 10) -> list[dict]:
+        """Состояние пространств имен и самые крупные ключи"""
+        now = time.time()
+        result = []
+
+        for name, ns in self._namespaces.items():
+            largest = sorted(
+                ns.entries.items(), key=lambda kv: kv[1].size, reverse=True
+            )[:top_keys]
+            result.append(
+                {
+                    "namespace": name,
+                    "entries": len(ns.entries),
+                    "total_bytes": ns.total_bytes,
+                    "max_entries": ns.max_entries,
+                    "max_bytes": ns.max_bytes,
+                    "top_keys": [
+                        {
+                            "key": key,
+                            "size": item.size,
+                            "expires_in": item.expires - now,
+                            "tags": sorted(item.tags),
+                        }
+                        for key, item in largest
+                    ],
+                }
+            )
+
+        return result
+
+
+def create_cache_backend() -> CacheBackend:
+    """Выбор хранилища кеша по настройкам"""
+    if settings.CACHE_BACKEND == "shared":
+        return SharedCache(settings.CACHE_SHARED_PATH)
+    return SimpleCache()
 
 
 # Глобальный экземпляр кеша
-cache = SimpleCache()
+cache = create_cache_backend()
+
+
+def _canonical_arg(arg: Any) -> Any:
+    """Приведение аргумента к виду, не зависящему от порядка и процесса"""
+    if hasattr(arg, "fingerprint"):
+        return arg.fingerprint()
+    if hasattr(arg, "model_dump"):
+        return arg.model_dump(mode="json")
+    return arg
+
+
+def normalize_call(
+    signature: inspect.Signature, args: tuple, kwargs: dict
+) -> tuple[tuple, dict]:
+    """
+    Аргументы вызова в едином виде: именованные параметры (со значениями
+    по умолчанию) - в kwargs, чтобы f(), f(False) и f(compact=False)
+    давали один ключ кеша
+    """
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+
+    key_args: tuple = ()
+    key_kwargs = {}
+    for name, value in bound.arguments.items():
+        kind = signature.parameters[name].kind
+        if kind is inspect.Parameter.VAR_POSITIONAL:
+            key_args = value
+        elif kind is inspect.Parameter.VAR_KEYWORD:
+            key_kwargs.update(value)
+        else:
+            key_kwargs[name] = value
+    return key_args, key_kwargs
+
+
+def make_cache_key(args: tuple, kwargs: dict) -> str:
+    """Детерминированный ключ кеша по аргументам вызова (сессии БД не учитываются)"""
+    payload = json.dumps(
+        [
+            [_canonical_arg(a) for a in args if not isinstance(a, AsyncSession)],
+            {
+                k: _canonical_arg(v)
+                for k, v in kwargs.items()
+                if not isinstance(v, AsyncSession)
+            },
+        ],
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+# Вычисления, выполняющиеся прямо сейчас: ключ -> задача
+_inflight: Dict[str, asyncio.Task] = {}
+
+# Сколько запросов ждут каждое вычисление
+_waiting: Dict[asyncio.Task, int] = {}
+
+# Фоновые обновления: их не отменяют, даже если ожидающих не осталось
+_background: set[asyncio.Task] = set()
+
+
+def _forget_inflight(flight_key: str, task: asyncio.Task) -> None:
+    """Снять задачу с учета после завершения"""
+    if _inflight.get(flight_key) is task:
+        del _inflight[flight_key]
+
+    # Помечаем исключение как полученное, даже если всех ожидающих отменили
+    if not task.cancelled():
+        task.exception()
 
 
-def cached(ttl_seconds: int = 300):
+def _start_flight(flight_key: str, factory) -> asyncio.Task:
+    """Вернуть уже идущее вычисление по ключу или запустить новое"""
+    task = _inflight.get(flight_key)
+    if task is None:
+        task = asyncio.ensure_future(factory())
+        _inflight[flight_key] = task
+        task.add_done_callback(lambda t: _forget_inflight(flight_key, t))
+    return task
+
+
+async def single_flight(flight_key: str, factory) -> Any:
+    """
+    Объединяет одновременные вычисления с одинаковым ключом в одно:
+    первый вызов запускает задачу, остальные ждут ее результата или исключения.
+    Отмена одного из ожидающих не прерывает вычисление для остальных,
+    а если отменены все (клиенты ушли) - вычисление отменяется.
+    """
+    task = _start_flight(flight_key, factory)
+    _waiting[task] = _waiting.get(task, 0) + 1
+    try:
+        return await asyncio.shield(task)
+    finally:
+        _waiting[task] -= 1
+        if not _waiting[task]:
+            del _waiting[task]
+            if not task.done() and task not in _background:
+                task.cancel()
+
+
+def _log_refresh_failure(flight_key: str, task: asyncio.Task) -> None:
+    """Фоновое обновление никто не ждет, поэтому ошибку только логируем"""
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(
+            f"Ошибка фонового обновления кеша {flight_key}: {task.exception()}"
+        )
+
+
+def refresh_in_background(flight_key: str, factory) -> None:
+    """Запустить одно фоновое обновление, если оно еще не идет"""
+    if flight_key in _inflight:
+        return
+
+    task = _start_flight(flight_key, factory)
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+    task.add_done_callback(lambda t: _log_refresh_failure(flight_key, t))
+
+
+def cached(
+    ttl_seconds: int = 300,
+    namespace: str | None = None,
+    max_entries: int | None = None,
+    max_bytes: int | None = None,
+    stale_ttl_seconds: int = 0,
+    tags=(),
+    should_cache=None,
+):
+    """
+    Кеширует результат асинхронной функции.
+    При stale_ttl_seconds > 0 в течение этого окна после истечения ttl
+    возвращается прежнее значение, а обновление запускается в фоне.
+    tags - таблицы, от которых зависит результат (см. cache.invalidate_tags).
+    should_cache(result) -> bool - сохранять ли результат (например,
+    неполный ответ возвращается, но не кешируется).
+    """
+
     def decorator(func):
+        cache_namespace = namespace or func.__qualname__
+        cache.configure_namespace(cache_namespace, max_entries, max_bytes)
+        stats = cache.stats(cache_namespace)
+        signature = inspect.signature(func)
+
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            filterable_args = []
-            for arg in args:
-                if not isinstance(arg, AsyncSession):
-                    if hasattr(arg, "model_dump"):
-                        filterable_args.append(arg.model_dump())
-                    else:
-                        filterable_args.append(arg)
-
-            cache_key = f"{func.__name__}_{hash(str(filterable_args) + str(sorted(kwargs.items())))}"
-
-            cached_result = await cache.get(cache_key)
-            if cached_result is not None:
-                return cached_result
-
-            result = await func(*args, **kwargs)
-            await cache.set(cache_key, result, ttl_seconds)
-            return result
+            cache_key = make_cache_key(*normalize_call(signature, args, kwargs))
+
+            async def compute():
+                versions = await cache.tag_versions(tags)
+                started = time.perf_counter()
+                result = await func(*args, **kwargs)
+                stats.record_recompute(time.perf_counter() - started)
+                if should_cache is not None and not should_cache(result):
+                    return result
+                await cache.set(
+                    cache_key,
+                    result,
+                    ttl_seconds,
+                    cache_namespace,
+                    stale_ttl_seconds,
+                    tags,
+                    versions,
+                )
+                return result
+
+            flight_key = f"{cache_namespace}:{cache_key}"
+
+            entry = await cache.get_entry(cache_key, cache_namespace)
+            if entry is not None and entry.value is not None:
+                if entry.is_fresh:
+                    stats.hits += 1
+                else:
+                    stats.stale_hits += 1
+                    refresh_in_background(flight_key, compute)
+                return entry.value
+
+            stats.misses += 1
+            if flight_key in _inflight:
+                stats.coalesced += 1
+
+            return await single_flight(flight_key, compute)
 
         return wrapper
 
@@ -0,0 +1,68 @@
+import asyncio
+import logging
+import time
+
+from myapp.config import settings
+from myapp.services.equipment_service import EquipmentService
+from myapp.services.filter_options_service import FilterOptionsService
+from myapp.services.reference_service import ReferenceService
+
+logger = logging.getLogger(__name__)
+
+# Элементы, досчитывающиеся в фоне после таймаута прогрева
+_background_items: set[asyncio.Task] = set()
+
+# Что прогревается при запуске: (название для логов, функция под @cached)
+WARMUP_ITEMS = (
+    ("filter_options", FilterOptionsService.get_filter_options),
+    ("case_form_references", ReferenceService.get_case_form_references),
+    ("equipment_all_flat", EquipmentService.get_all_equipment_flat),
+)
+
+
+class CacheWarmupService:
+
+    @staticmethod
+    async def _warm_item(name: str, loader, semaphore: asyncio.Semaphore) -> None:
+        """Вычислить одно значение и положить его в кеш"""
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await loader()
+                logger.info(
+                    f"Прогрев кеша {name}: {time.perf_counter() - started:.2f} с"
+                )
+            except Exception as e:
+                logger.error(f"Прогрев кеша {name} не удался: {e}")
+
+    @staticmethod
+    async def warm_up(
+        concurrency: int = settings.CACHE_WARMUP_CONCURRENCY,
+        timeout: float = settings.CACHE_WARMUP_TIMEOUT,
+    ) -> None:
+        """
+        Прогреть кеш перед приемом запросов.
+        По истечении timeout запуск продолжается, а незавершенные
+        элементы досчитываются в фоне (их не ждут, но и не отменяют:
+        отмена ожидающего отменила бы и само вычисление).
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        started = time.perf_counter()
+        tasks = {
+            asyncio.create_task(
+                CacheWarmupService._warm_item(name, loader, semaphore)
+            ): name
+            for name, loader in WARMUP_ITEMS
+        }
+
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            _background_items.add(task)
+            task.add_done_callback(_background_items.discard)
+
+        if pending:
+            logger.warning(
+                f"Прогрев кеша не уложился в {timeout} с, досчитываются в фоне: "
+                f"{', '.join(sorted(tasks[t] for t in pending))}"
+            )
+        logger.info(f"Прогрев кеша завершен за {time.perf_counter() - started:.2f} с")
@@ -1,13 +1,68 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any
+
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from myapp.config import settings
 from myapp.models.repair_case_equipment import RepairCaseEquipment
 from myapp.schemas.cases import CaseList
-from myapp.schemas.filters import CaseFilterParams, FilterOptionsResponse
-from myapp.database.query_builders.query_case_filters import build_filtered_case_stmt
+from myapp.schemas.filters import (
+    CaseFilterParams,
+    FacetValuesResponse,
+    FilterOptionsResponse,
+    TypeaheadResponse,
+)
+from myapp.database.query_builders.query_case_builders import select_detail_relations
+from myapp.database.query_builders.query_case_filters import (
+    build_filtered_case_ids_stmt,
+    build_keyset_condition,
+    case_order_columns,
+)
 from myapp.services.case_status_service import CaseStatusService
+from myapp.services.facet_index_service import facet_index
 from myapp.services.filter_options_service import FilterOptionsService
 
+# Направление курсора: страница после или перед ключом
+CURSOR_NEXT = "next"
+CURSOR_PREV = "prev"
+
+
+def encode_case_cursor(params: CaseFilterParams, key: list, direction: str) -> str:
+    """Курсор страницы: ключ сортировки граничного случая и направление"""
+    payload = {
+        "o": params.order_by,
+        "s": params.sort_order,
+        "d": direction,
+        "k": [
+            value.isoformat() if isinstance(value, datetime) else value for value in key
+        ],
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_case_cursor(params: CaseFilterParams) -> tuple[str, list]:
+    """Направление и ключ из курсора (ValueError - курсор не подходит)"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(params.cursor.encode("ascii")))
+        direction = payload["d"]
+        key = payload["k"]
+        if params.order_by == "date_recorded":
+            key = [datetime.fromisoformat(key[0]), int(key[1])]
+        else:
+            key = [int(key[0])]
+    except (ValueError, TypeError, KeyError, IndexError, UnicodeError):
+        raise ValueError("Некорректный курсор")
+
+    if direction not in (CURSOR_NEXT, CURSOR_PREV):
+        raise ValueError("Некорректный курсор")
+    if (payload.get("o"), payload.get("s")) != (params.order_by, params.sort_order):
+        raise ValueError("Курсор выдан для другой сортировки")
+    return direction, key
+
 
 class CaseFilterService:
     """Сервис для фильтрации случаев и получения опций фильтров"""
@@ -18,59 +73,197 @@ class CaseFilterService:
     ) -> dict:  # Меняем возвращаемый тип на dict
         """Основной метод фильтрации случаев с подсчетом total_count"""
 
-        # Получить базовый запрос с фильтрами
-        base_stmt = build_filtered_case_stmt(params)
+        # Сначала отбираются только id подходящих случаев (без связей),
+        # затем загружается одна страница
+        ids_stmt = build_filtered_case_ids_stmt(params)
 
-        count_stmt = select(func.count()).select_from(base_stmt.subquery())
-        total_result = await session.execute(count_stmt)
-        total_count = total_result.scalar_one()
+        total_count = None
+        if settings.FACET_INDEX_ENABLED:
+            total_count = facet_index.count_cases(params)
+        if total_count is None:
+            count_stmt = select(func.count()).select_from(ids_stmt.subquery())
+            total_result = await session.execute(count_stmt)
+            total_count = total_result.scalar_one()
 
-        numbered_cte = select(
-            RepairCaseEquipment.id,
-            func.row_number()
-            .over(order_by=RepairCaseEquipment.id)
-            .label("display_number"),
-        ).cte("numbered_cases")
+        page = {"next_cursor": None, "prev_cursor": None}
+        if params.cursor_mode:
+            case_ids, page["next_cursor"], page["prev_cursor"] = (
+                await CaseFilterService._fetch_cursor_page(session, ids_stmt, params)
+            )
+        else:
+            case_ids = await CaseFilterService._fetch_offset_page(
+                session, ids_stmt, params
+            )
 
-        stmt = base_stmt.outerjoin(
-            numbered_cte, RepairCaseEquipment.id == numbered_cte.c.id
-        )
-        stmt = stmt.add_columns(numbered_cte.c.display_number)
+        cases_by_id = await CaseFilterService._load_cases(session, case_ids)
+        display_numbers = await CaseFilterService._display_numbers(session, case_ids)
 
-        stmt = stmt.order_by(None)
-        if params.sort_order == "asc":
-            stmt = stmt.order_by(RepairCaseEquipment.id.asc())
-        else:
-            stmt = stmt.order_by(RepairCaseEquipment.id.desc())
+        cases = []
+        for case_id in case_ids:
+            case_obj = cases_by_id.get(case_id)
+            if case_obj is None:
+                # Удален между отбором id и загрузкой
+                continue
+
+            CaseStatusService.enrich_case_with_status_and_creator(
+                case_obj, case_obj.status
+            )
+            case_obj.display_number = display_numbers.get(case_id)
+            cases.append(CaseList.model_validate(case_obj))
+
+        return {"items": cases, "total": total_count, **page}
+
+    @staticmethod
+    def _order_by(params: CaseFilterParams, ascending: bool) -> list:
+        return [
+            column.asc() if ascending else column.desc()
+            for column in case_order_columns(params.order_by)
+        ]
+
+    @staticmethod
+    async def _fetch_offset_page(
+        session: AsyncSession, ids_stmt, params: CaseFilterParams
+    ) -> list[int]:
+        """id случаев страницы по skip/limit"""
+        stmt = ids_stmt.order_by(
+            *CaseFilterService._order_by(params, params.sort_order == "asc")
+        )
 
         # Пагинация
         stmt = stmt.offset(params.skip).limit(params.limit)
 
         result = await session.execute(stmt)
-        rows = result.unique().all()
+        return [row.id for row in result.all()]
 
-        cases = []
-        for row in rows:
-            case_obj = row[0]
-            status_value = row[1]
-            display_number = row[2]
+    @staticmethod
+    async def _fetch_cursor_page(
+        session: AsyncSession, ids_stmt, params: CaseFilterParams
+    ) -> tuple[list[int], str | None, str | None]:
+        """
+        Страница по курсору: условие по ключу сортировки вместо OFFSET,
+        поэтому глубина страницы не влияет на стоимость запроса.
+        Возвращает id случаев и курсоры следующей и предыдущей страниц.
+        """
+        direction, key = CURSOR_NEXT, None
+        if params.cursor:
+            direction, key = decode_case_cursor(params)
+        backward = direction == CURSOR_PREV
 
-            CaseStatusService.enrich_case_with_status_and_creator(
-                case_obj, status_value
+        # Предыдущая страница выбирается в обратном порядке от ключа
+        fetch_ascending = (params.sort_order == "asc") != backward
+        columns = case_order_columns(params.order_by)
+
+        stmt = ids_stmt
+        if key is not None:
+            stmt = stmt.where(build_keyset_condition(columns, key, fetch_ascending))
+        stmt = stmt.order_by(*CaseFilterService._order_by(params, fetch_ascending))
+        # Лишняя строка показывает, есть ли страницы дальше
+        stmt = stmt.limit(params.limit + 1)
+
+        rows = (await session.execute(stmt)).all()
+        has_more = len(rows) > params.limit
+        rows = rows[: params.limit]
+        if backward:
+            rows.reverse()
+        if not rows:
+            return [], None, None
+
+        def row_key(row) -> list[Any]:
+            return [getattr(row, column.key) for column in columns]
+
+        first, last = row_key(rows[0]), row_key(rows[-1])
+        if backward:
+            next_cursor = encode_case_cursor(params, last, CURSOR_NEXT)
+            prev_cursor = (
+                encode_case_cursor(params, first, CURSOR_PREV) if has_more else None
             )
-            case_obj.display_number = display_number
-            cases.append(CaseList.model_validate(case_obj))
+        else:
+            next_cursor = (
+                encode_case_cursor(params, last, CURSOR_NEXT) if has_more else None
+            )
+            prev_cursor = (
+                encode_case_cursor(params, first, CURSOR_PREV)
+                if key is not None
+                else None
+            )
+        return [row.id for row in rows], next_cursor, prev_cursor
+
+    @staticmethod
+    async def _load_cases(
+        session: AsyncSession, case_ids: list[int]
+    ) -> dict[int, RepairCaseEquipment]:
+        """Случаи страницы со связями: справочники догружаются запросами по id"""
+        if not case_ids:
+            return {}
+
+        stmt = (
+            select(RepairCaseEquipment)
+            .where(RepairCaseEquipment.id.in_(case_ids))
+            .options(*select_detail_relations())
+        )
+        result = await session.execute(stmt)
+        return {case.id: case for case in result.scalars().all()}
+
+    @staticmethod
+    async def _display_numbers(
+        session: AsyncSession, case_ids: list[int]
+    ) -> dict[int, int]:
+        """
+        Сквозные номера случаев страницы (номер по id среди всех случаев):
+        нумеруется только диапазон id страницы, а не вся таблица
+        """
+        if not case_ids:
+            return {}
 
-        return {"items": cases, "total": total_count}
+        low, high = min(case_ids), max(case_ids)
+        before = (
+            select(func.count())
+            .select_from(RepairCaseEquipment)
+            .where(RepairCaseEquipment.id < low)
+            .scalar_subquery()
+        )
+        numbered = (
+            select(
+                RepairCaseEquipment.id,
+                (
+                    before + func.row_number().over(order_by=RepairCaseEquipment.id)
+                ).label("display_number"),
+            )
+            .where(RepairCaseEquipment.id.between(low, high))
+            .subquery()
+        )
+        stmt = select(numbered.c.id, numbered.c.display_number).where(
+            numbered.c.id.in_(case_ids)
+        )
+        return dict((await session.execute(stmt)).all())
 
     @staticmethod
-    async def get_filter_options() -> FilterOptionsResponse:
+    async def get_filter_options(compact: bool = False) -> FilterOptionsResponse:
         """Получить опции фильтров"""
-        return await FilterOptionsService.get_filter_options()
+        return await FilterOptionsService.get_filter_options(compact)
+
+    @staticmethod
+    async def search_facet_values(
+        facet: str, query: str, substring: bool, limit: int, cursor: str | None
+    ) -> FacetValuesResponse:
+        """Получить страницу значений фасета"""
+        return await FilterOptionsService.search_facet_values(
+            facet, query, substring, limit, cursor
+        )
+
+    @staticmethod
+    async def typeahead(field: str, query: str, limit: int) -> TypeaheadResponse:
+        """Получить подсказки по фрагменту номера"""
+        return await FilterOptionsService.typeahead(field, query, limit)
 
     @staticmethod
     async def get_dynamic_filter_options(
         params: CaseFilterParams,
     ) -> FilterOptionsResponse:
         """Получить динамические опции фильтров"""
+        if settings.FACET_INDEX_ENABLED:
+            response = await FilterOptionsService.get_index_filter_options(params)
+            if response is not None:
+                return response
+
         return await FilterOptionsService.get_dynamic_filter_options_optimized(params)
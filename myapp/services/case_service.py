@@ -13,7 +13,10 @@ from myapp.services.equipment_service import EquipmentService
 from myapp.services.warranty_service import WarrantyService
 from myapp.services.case_status_service import CaseStatusService
 from myapp.services.waybill_service import WaybillService
+from myapp.services.filter_options_service import FilterOptionsService
 from myapp.services.files.file_management_service import FileManagementService
+from myapp.services.cache_bus_service import invalidation_bus
+from myapp.constants.cache_tags import TAG_CASES, CASE_TAGS
 
 
 class CaseService:
@@ -105,6 +108,8 @@ class CaseService:
 
         session.add(case)
         await session.flush()
+        await FilterOptionsService.update_case_facets(session, case.id, {})
+        await invalidation_bus.publish(session, *CASE_TAGS)
 
         # Получаем объект со всеми связями и вычисленным статусом
         created_case = await CaseService._get_case_with_relations(session, case.id)
@@ -120,11 +125,15 @@ class CaseService:
     ) -> RepairCaseEquipment | None:
         """Обновление случая и автоматическое переопределение supplier_id"""
         case: RepairCaseEquipment | None = await session.get(
-            RepairCaseEquipment, case_id
+            RepairCaseEquipment, case_id, with_for_update=True
         )
         if not case:
             return None
 
+        facets_before = await FilterOptionsService.snapshot_case_facets(
+            session, case_id
+        )
+
         # Автоматическая смена владельца при редактировании партнером
         if current_user_id and case.user_id != current_user_id:
             case.user_id = current_user_id
@@ -172,6 +181,8 @@ class CaseService:
             setattr(case, field, value)
 
         await session.flush()
+        await FilterOptionsService.update_case_facets(session, case_id, facets_before)
+        await invalidation_bus.publish(session, TAG_CASES)
 
         # Обновление WarrantyWork
         if case_data.warranty_work:
@@ -253,6 +264,7 @@ class CaseService:
             select(RepairCaseEquipment)
             .where(RepairCaseEquipment.id == case_id)
             .options(selectinload(RepairCaseEquipment.files))
+            .with_for_update()
         )
         result = await session.execute(stmt)
         case = result.scalar_one_or_none()
@@ -264,6 +276,12 @@ class CaseService:
             for file_rec in case.files:
                 await FileManagementService.delete_file(session, file_rec.id)
 
+        facets_before = await FilterOptionsService.snapshot_case_facets(
+            session, case_id
+        )
+        await CaseStatusService.forget_case(session, case)
         await session.delete(case)
+        await FilterOptionsService.update_case_facets(session, case_id, facets_before)
+        await invalidation_bus.publish(session, *CASE_TAGS)
 
         return 1
@@ -0,0 +1,159 @@
+from collections import Counter
+from datetime import date, datetime, timezone
+
+from sqlalchemy import Date, cast, delete, func, select, text, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from myapp.models.case_status_history import CaseStatusAge, CaseStatusTransition
+from myapp.models.repair_case_equipment import RepairCaseEquipment
+from myapp.schemas.cases import (
+    StatusAgeBucket,
+    StatusDashboardItem,
+    StatusDashboardResponse,
+)
+
+# Нижние границы интервалов срока в статусе (дни)
+STATUS_AGE_BUCKETS = (0, 7, 14, 30, 60, 90)
+
+
+def status_day(at: datetime) -> date:
+    """День (UTC), с которого случай находится в статусе"""
+    return at.astimezone(timezone.utc).date()
+
+
+class CaseStatusHistoryService:
+    """
+    История статусов (case_status_transitions) и сводка сроков в статусах
+    (case_status_ages). Обе таблицы пишутся в транзакции изменения случая.
+    """
+
+    @staticmethod
+    async def record_changes(
+        session: AsyncSession,
+        changes: list[tuple[int, str | None, datetime | None, str | None, datetime]],
+    ) -> None:
+        """
+        Записать смены статусов: (id случая, прежний статус, с какого
+        момента он был, новый статус, момент смены). Новый статус None -
+        случай удален.
+        """
+        if not changes:
+            return
+
+        await session.execute(
+            insert(CaseStatusTransition),
+            [
+                {"case_id": case_id, "from_status": old, "to_status": new, "at": at}
+                for case_id, old, _, new, at in changes
+            ],
+        )
+
+        delta: Counter[tuple[str, date]] = Counter()
+        for _, old, old_since, new, at in changes:
+            if old is not None and old_since is not None:
+                delta[(old, status_day(old_since))] -= 1
+            if new is not None:
+                delta[(new, status_day(at))] += 1
+        await CaseStatusHistoryService._apply_age_delta(session, delta)
+
+    @staticmethod
+    async def _apply_age_delta(
+        session: AsyncSession, delta: Counter[tuple[str, date]]
+    ) -> None:
+        # Одинаковый порядок строк во всех транзакциях исключает взаимоблокировки
+        rows = sorted(
+            (
+                {"status": status, "since": since, "count": change}
+                for (status, since), change in delta.items()
+                if change
+            ),
+            key=lambda row: (row["status"], row["since"]),
+        )
+        if not rows:
+            return
+
+        stmt = insert(CaseStatusAge).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[CaseStatusAge.status, CaseStatusAge.since],
+            set_={"count": CaseStatusAge.count + stmt.excluded.count},
+        )
+        await session.execute(stmt)
+
+        await session.execute(
+            delete(CaseStatusAge).where(
+                CaseStatusAge.count <= 0,
+                tuple_(CaseStatusAge.status, CaseStatusAge.since).in_(
+                    [(row["status"], row["since"]) for row in rows]
+                ),
+            )
+        )
+
+    @staticmethod
+    async def rebuild_ages(session: AsyncSession) -> None:
+        """Пересчитать сводку сроков в статусах по всем случаям"""
+        # Изменения случаев на время пересчета ждут его окончания
+        await session.execute(text("LOCK TABLE case_status_ages IN EXCLUSIVE MODE"))
+
+        since = cast(
+            func.timezone("UTC", RepairCaseEquipment.status_changed_at), Date
+        ).label("since")
+        stmt = (
+            select(RepairCaseEquipment.status, since, func.count())
+            .where(
+                RepairCaseEquipment.status.isnot(None),
+                RepairCaseEquipment.status_changed_at.isnot(None),
+            )
+            .group_by(RepairCaseEquipment.status, since)
+        )
+
+        await session.execute(delete(CaseStatusAge))
+        await session.execute(
+            insert(CaseStatusAge).from_select(["status", "since", "count"], stmt)
+        )
+
+    @staticmethod
+    async def is_empty(session: AsyncSession) -> bool:
+        """Сводка сроков еще не заполнена"""
+        stmt = select(CaseStatusAge.status).limit(1)
+        return (await session.execute(stmt)).first() is None
+
+    @staticmethod
+    async def get_dashboard(
+        session: AsyncSession, older_than_days: int
+    ) -> StatusDashboardResponse:
+        """
+        Число случаев по статусам и срокам в статусе. Считается по сводке,
+        размер которой - статусы x дни, а не случаи.
+        """
+        today = datetime.now(timezone.utc).date()
+        stmt = select(CaseStatusAge.status, CaseStatusAge.since, CaseStatusAge.count)
+
+        items: dict[str, StatusDashboardItem] = {}
+        for status, since, count in (await session.execute(stmt)).all():
+            item = items.get(status)
+            if item is None:
+                item = items[status] = StatusDashboardItem(
+                    status=status,
+                    buckets=[
+                        StatusAgeBucket(min_days=low, max_days=high)
+                        for low, high in zip(
+                            STATUS_AGE_BUCKETS, STATUS_AGE_BUCKETS[1:] + (None,)
+                        )
+                    ],
+                )
+
+            age = (today - since).days
+            item.total += count
+            if age > older_than_days:
+                item.older_than += count
+            for bucket in reversed(item.buckets):
+                if age >= bucket.min_days:
+                    bucket.count += count
+                    break
+
+        return StatusDashboardResponse(
+            older_than_days=older_than_days,
+            total=sum(item.total for item in items.values()),
+            items=sorted(items.values(), key=lambda item: item.status),
+        )
@@ -1,48 +1,247 @@
-from sqlalchemy import select
+import logging
+from datetime import datetime, timezone
+from typing import Any, Sequence
+
+from sqlalchemy import func, literal, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from myapp.database.base import LANE_BULK, db_governor
 from myapp.models.warranty_work import WarrantyWork
 from myapp.models.repair_case_equipment import RepairCaseEquipment
 from myapp.models.waybill_docs import WaybillDoc
 from myapp.database.query_builders.expressions import status_expr
+from myapp.services.case_status_history_service import CaseStatusHistoryService
+
+logger = logging.getLogger(__name__)
+
+# Статус случая, для которого calculate_case_status ничего не вернул
+DEFAULT_CASE_STATUS = "Ожидает уведомление поставщика"
+
+# Входы calculate_case_status в порядке аргументов (см. status_expr)
+STATUS_INPUT_COLUMNS = tuple(status_expr.element.clauses)
+
+# Сколько уникальных наборов входов вычисляется одним запросом
+STATUS_BATCH_SIZE = 5000
 
 
 class CaseStatusService:
-    """Сервис для работы со статусами случаев"""
+    """
+    Сервис для работы со статусами случаев.
+    Статус вычисляется функцией calculate_case_status и хранится в колонке
+    repair_case_equipment.status: ее обновляет refresh_status при каждом
+    изменении случая, рекл. работы или ТТН, а фильтры и списки читают ее.
+    Смены статуса попадают в историю и сводку сроков (CaseStatusHistoryService).
+    """
 
     @staticmethod
-    def build_status_subquery():
-        """Создает подзапрос для вычисления статуса"""
-        return (
+    def build_status_calculation():
+        """Вычисление статуса по полям случая, рекл. работы и ТТН"""
+        calculated = (
             select(status_expr)
             .select_from(WarrantyWork)
             .outerjoin(WaybillDoc, WaybillDoc.case_id == WarrantyWork.case_id)
             .where(WarrantyWork.case_id == RepairCaseEquipment.id)
             .correlate(RepairCaseEquipment)
             .scalar_subquery()
-            .label("calculated_status")
         )
+        return func.coalesce(calculated, DEFAULT_CASE_STATUS)
+
+    @staticmethod
+    async def refresh_status(session: AsyncSession, case_id: int) -> None:
+        """
+        Пересчитать хранимый статус случая (в той же транзакции).
+        Если статус сменился, смена записывается в историю.
+        """
+        stmt = (
+            select(
+                RepairCaseEquipment.status,
+                RepairCaseEquipment.status_changed_at,
+                CaseStatusService.build_status_calculation(),
+            )
+            .where(RepairCaseEquipment.id == case_id)
+            .with_for_update(of=RepairCaseEquipment)
+        )
+        row = (await session.execute(stmt)).first()
+        if row is None:
+            return
+
+        old_status, old_since, new_status = row
+        if old_status == new_status:
+            return
+
+        now = datetime.now(timezone.utc)
+        await session.execute(
+            update(RepairCaseEquipment)
+            .where(RepairCaseEquipment.id == case_id)
+            .values(status=new_status, status_changed_at=now)
+        )
+        await CaseStatusHistoryService.record_changes(
+            session, [(case_id, old_status, old_since, new_status, now)]
+        )
+
+    @staticmethod
+    async def forget_case(session: AsyncSession, case: RepairCaseEquipment) -> None:
+        """Записать в историю удаление случая (до удаления)"""
+        if case.status is None:
+            return
+        await CaseStatusHistoryService.record_changes(
+            session,
+            [
+                (
+                    case.id,
+                    case.status,
+                    case.status_changed_at,
+                    None,
+                    datetime.now(timezone.utc),
+                )
+            ],
+        )
+
+    @staticmethod
+    async def backfill_statuses(
+        session: AsyncSession, only_missing: bool = True
+    ) -> int:
+        """
+        Пересчитать хранимые статусы: только незаполненные (новая колонка)
+        или все (после изменения calculate_case_status). Смены статуса
+        пишутся в историю, сводка сроков пересчитывается.
+        Возвращает число обновленных случаев.
+        """
+        calculated = CaseStatusService.build_status_calculation()
+        stmt = select(
+            RepairCaseEquipment.id,
+            RepairCaseEquipment.status,
+            RepairCaseEquipment.status_changed_at,
+            RepairCaseEquipment.date_recorded,
+            calculated,
+        )
+        if only_missing:
+            stmt = stmt.where(
+                RepairCaseEquipment.status.is_(None)
+                | RepairCaseEquipment.status_changed_at.is_(None)
+            )
+        else:
+            stmt = stmt.where(RepairCaseEquipment.status.is_distinct_from(calculated))
+
+        rows = (
+            await session.execute(stmt.with_for_update(of=RepairCaseEquipment))
+        ).all()
+        if not rows:
+            return 0
+
+        now = datetime.now(timezone.utc)
+        updates = []
+        changes = []
+        for case_id, old_status, old_since, recorded, new_status in rows:
+            # Случаи без истории считаются в статусе с момента регистрации
+            changed_at = recorded if old_since is None else now
+            if old_status == new_status:
+                changed_at = old_since or recorded
+            else:
+                changes.append((case_id, old_status, old_since, new_status, changed_at))
+            updates.append(
+                {"id": case_id, "status": new_status, "status_changed_at": changed_at}
+            )
+
+        await session.execute(update(RepairCaseEquipment), updates)
+        await CaseStatusHistoryService.record_changes(session, changes)
+        await CaseStatusHistoryService.rebuild_ages(session)
+        return len(rows)
+
+    @staticmethod
+    def status_inputs(cases: Sequence[RepairCaseEquipment]) -> dict[str, list[Any]]:
+        """
+        Колонки входов статуса по загруженным случаям (с warranty_work
+        и waybill_doc): имя колонки -> значения по случаям
+        """
+        owners = {
+            RepairCaseEquipment.__table__: lambda case: case,
+            WarrantyWork.__table__: lambda case: case.warranty_work,
+            WaybillDoc.__table__: lambda case: case.waybill_doc,
+        }
+        return {
+            column.key: [
+                getattr(owners[column.table](case), column.key, None) for case in cases
+            ]
+            for column in STATUS_INPUT_COLUMNS
+        }
+
+    @staticmethod
+    def build_batch_status_stmt(rows: list[tuple]):
+        """
+        Статусы для пакета наборов входов одним запросом: входы передаются
+        массивами по колонкам и разворачиваются unnest, position - номер
+        набора в пакете (с 1)
+        """
+        arrays = [
+            literal([row[idx] for row in rows], ARRAY(column.type))
+            for idx, column in enumerate(STATUS_INPUT_COLUMNS)
+        ]
+        inputs = func.unnest(*arrays).table_valued(
+            *(column.key for column in STATUS_INPUT_COLUMNS),
+            with_ordinality="position",
+        )
+        status = func.calculate_case_status(
+            *(inputs.c[column.key] for column in STATUS_INPUT_COLUMNS)
+        )
+        return select(inputs.c.position, func.coalesce(status, DEFAULT_CASE_STATUS))
+
+    @staticmethod
+    async def evaluate_batch(
+        session: AsyncSession, columns: dict[str, Sequence[Any]]
+    ) -> list[str]:
+        """
+        Статусы по колонкам входов (ключи - имена STATUS_INPUT_COLUMNS):
+        запрос на пакет, а не на строку. Одинаковые наборы входов
+        вычисляются один раз.
+        """
+        rows = list(zip(*(columns[column.key] for column in STATUS_INPUT_COLUMNS)))
+        unique_rows = list(dict.fromkeys(rows))
+
+        statuses: dict[tuple, str] = {}
+        for start in range(0, len(unique_rows), STATUS_BATCH_SIZE):
+            batch = unique_rows[start : start + STATUS_BATCH_SIZE]
+            stmt = CaseStatusService.build_batch_status_stmt(batch)
+            for position, status in (await session.execute(stmt)).all():
+                statuses[batch[position - 1]] = status
+
+        return [statuses[row] for row in rows]
+
+    @staticmethod
+    async def ensure_statuses_filled() -> None:
+        """
+        Заполнить статусы случаев, у которых их еще нет (новая колонка),
+        и сводку сроков в статусах при первом запуске
+        """
+        async with db_governor.session(LANE_BULK) as session:
+            filled = await CaseStatusService.backfill_statuses(session)
+            if not filled and await CaseStatusHistoryService.is_empty(session):
+                await CaseStatusHistoryService.rebuild_ages(session)
+            await session.commit()
+        if filled:
+            logger.info(f"Заполнены статусы {filled} случаев")
 
     @staticmethod
     async def get_case_status(session: AsyncSession, case_id: int) -> str:
         """Получает статус конкретного случая"""
-        status_stmt = (
-            select(status_expr)
-            .select_from(WarrantyWork)
-            .outerjoin(WaybillDoc, WaybillDoc.case_id == WarrantyWork.case_id)
-            .join(RepairCaseEquipment, RepairCaseEquipment.id == WarrantyWork.case_id)
-            .where(WarrantyWork.case_id == case_id)
+        status_stmt = select(RepairCaseEquipment.status).where(
+            RepairCaseEquipment.id == case_id
         )
         result = await session.execute(status_stmt)
         status_value = result.scalar_one_or_none()
-        return status_value or "Ожидает уведомление поставщика"
+        return status_value or DEFAULT_CASE_STATUS
 
     @staticmethod
     def enrich_case_with_status_and_creator(
         case_obj, status_value
     ) -> RepairCaseEquipment:
-        """Добавляет статус и ФИО создателя"""
-        case_obj.status = status_value or "Ожидает уведомление поставщика"
+        """
+        Добавляет статус для вывода и ФИО создателя. Колонка status не
+        меняется (ее пишет только refresh_status): статус по умолчанию
+        для незаполненной колонки - отдельный атрибут display_status
+        """
+        case_obj.display_status = status_value or DEFAULT_CASE_STATUS
 
         if hasattr(case_obj, "user") and case_obj.user:
             case_obj.creator_full_name = case_obj.user.full_name
@@ -56,9 +255,7 @@ class CaseStatusService:
         session: AsyncSession, case_id: int, relations_loader
     ) -> RepairCaseEquipment | None:
         """Универсальный метод для загрузки случая со статусом"""
-        status_subquery = CaseStatusService.build_status_subquery()
-
-        stmt = select(RepairCaseEquipment, status_subquery)
+        stmt = select(RepairCaseEquipment, RepairCaseEquipment.status)
         stmt = stmt.options(*relations_loader())
         stmt = stmt.where(RepairCaseEquipment.id == case_id)
 
@@ -2,6 +2,7 @@ from sqlalchemy import select, delete
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
+from myapp.database.base import LANE_BULK, db_governor
 from myapp.database.transactional import transactional
 from myapp.models import RepairCaseEquipment
 from myapp.models.equipment_malfunctions import (
@@ -17,7 +18,14 @@ from myapp.schemas.equipment import (
     SupplierUpdate,
     MalfunctionUpdate,
 )
-from myapp.services.cache_service import cache
+from myapp.services.cache_bus_service import invalidation_bus
+from myapp.services.cache_service import cached
+from myapp.constants.cache_tags import (
+    TAG_SUPPLIERS,
+    TAG_MALFUNCTIONS,
+    TAG_EQUIPMENT,
+    TAG_EQUIPMENT_MALFUNCTIONS,
+)
 
 
 class EquipmentService:
@@ -56,7 +64,7 @@ class EquipmentService:
             session.add(supplier)
             await session.flush()
             was_created = True
-            await cache.clear()
+            await invalidation_bus.publish(session, TAG_SUPPLIERS)
 
         return supplier, was_created
 
@@ -84,7 +92,7 @@ class EquipmentService:
             supplier.supplier_name = data.supplier_name
 
         await session.flush()
-        await cache.clear()
+        await invalidation_bus.publish(session, TAG_SUPPLIERS)
 
         return supplier
 
@@ -102,7 +110,7 @@ class EquipmentService:
         await session.flush()
 
         if result.rowcount > 0:
-            await cache.clear()
+            await invalidation_bus.publish(session, TAG_SUPPLIERS)
 
         return result.rowcount > 0
 
@@ -179,7 +187,7 @@ class EquipmentService:
             malf = Malfunction(defect_name=name)
             session.add(malf)
             await session.flush()
-            await cache.clear()
+            await invalidation_bus.publish(session, TAG_MALFUNCTIONS)
         return malf
 
     @staticmethod
@@ -208,7 +216,7 @@ class EquipmentService:
             malfunction.defect_name = data.defect_name
 
         await session.flush()
-        await cache.clear()
+        await invalidation_bus.publish(session, TAG_MALFUNCTIONS)
 
         return malfunction
 
@@ -240,7 +248,9 @@ class EquipmentService:
         await session.flush()
 
         if result.rowcount > 0:
-            await cache.clear()
+            await invalidation_bus.publish(
+                session, TAG_MALFUNCTIONS, TAG_EQUIPMENT_MALFUNCTIONS
+            )
 
         return result.rowcount > 0
 
@@ -255,19 +265,19 @@ class EquipmentService:
         return (await session.execute(stmt)).scalar_one_or_none()
 
     @staticmethod
-    async def get_all_equipment_flat(
-        session: AsyncSession,
-    ) -> list[EquipmentWithPathResponse]:
+    @cached(ttl_seconds=600, tags=(TAG_EQUIPMENT,))
+    async def get_all_equipment_flat() -> list[EquipmentWithPathResponse]:
         """Получить ВСЕ оборудование плоским списком"""
-        stmt = select(Equipment)
-        result = await session.execute(stmt)
-        equipment_list = result.scalars().all()
+        async with db_governor.session(LANE_BULK) as session:
+            stmt = select(Equipment)
+            result = await session.execute(stmt)
+            equipment_list = result.scalars().all()
 
-        if not equipment_list:
-            return []
+            if not equipment_list:
+                return []
 
-        ids = [eq.id for eq in equipment_list]
-        children_map = await EquipmentService._get_has_children_map(session, ids)
+            ids = [eq.id for eq in equipment_list]
+            children_map = await EquipmentService._get_has_children_map(session, ids)
 
         return [
             EquipmentWithPathResponse(
@@ -441,7 +451,9 @@ class EquipmentService:
         )
         result = await session.execute(stmt)
 
-        await cache.clear()
+        await invalidation_bus.publish(
+            session, TAG_EQUIPMENT, TAG_EQUIPMENT_MALFUNCTIONS
+        )
 
         return result.scalar_one()
 
@@ -471,7 +483,7 @@ class EquipmentService:
 
         await session.flush()
         await session.refresh(equipment, ["malfunctions"])
-        await cache.clear()
+        await invalidation_bus.publish(session, TAG_EQUIPMENT)
 
         return equipment
 
@@ -510,7 +522,9 @@ class EquipmentService:
         await session.flush()
 
         if result.rowcount > 0:
-            await cache.clear()
+            await invalidation_bus.publish(
+                session, TAG_EQUIPMENT, TAG_EQUIPMENT_MALFUNCTIONS
+            )
 
         return result.rowcount > 0
 
@@ -553,7 +567,7 @@ class EquipmentService:
         )
         result = await session.execute(stmt)
 
-        await cache.clear()
+        await invalidation_bus.publish(session, TAG_EQUIPMENT_MALFUNCTIONS)
 
         return list(result.scalars().all())
 
@@ -573,6 +587,6 @@ class EquipmentService:
         await session.flush()
 
         if result.rowcount > 0:
-            await cache.clear()
+            await invalidation_bus.publish(session, TAG_EQUIPMENT_MALFUNCTIONS)
 
         return result.rowcount > 0
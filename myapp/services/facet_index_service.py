@@ -0,0 +1,516 @@
+import asyncio
+import logging
+import time
+from array import array
+from typing import Any, Iterable
+
+from sqlalchemy import String, literal, select, union_all
+
+from myapp.config import settings
+from myapp.constants.filter_constants import FACET_INDEX_BITMAP_MAX_VALUES
+from myapp.database.base import LANE_BULK, LANE_INTERACTIVE, db_governor
+from myapp.database.query_builders.query_case_filters import (
+    STATUS_FILTER_KEY,
+    filter_field_key,
+    repair_case_filter_fields,
+    substring_filter_fields,
+    warranty_work_filter_fields,
+    waybill_doc_filter_fields,
+)
+from myapp.database.query_builders.query_filter_options import facet_field_key
+from myapp.models.repair_case_equipment import RepairCaseEquipment
+from myapp.models.warranty_work import WarrantyWork
+from myapp.models.waybill_docs import WaybillDoc
+from myapp.schemas.filters import CaseFilterParams
+from myapp.utils.filters_utils import normalize_filter_value
+
+logger = logging.getLogger(__name__)
+
+# Код пустого значения (NULL) в массиве колонки
+NO_VALUE = -1
+
+
+def iter_slots(mask: int) -> Iterable[int]:
+    """Номера установленных битов маски по возрастанию"""
+    bits = bin(mask)[:1:-1]
+    position = bits.find("1")
+    while position != -1:
+        yield position
+        position = bits.find("1", position + 1)
+
+
+def case_filter_fields(params: CaseFilterParams) -> list[tuple]:
+    """Все поля фильтра случаев: (значение параметра, колонка)"""
+    return (
+        repair_case_filter_fields(params)
+        + warranty_work_filter_fields(params)
+        + waybill_doc_filter_fields(params)
+    )
+
+
+def indexed_columns() -> dict[str, Any]:
+    """Колонки индекса по ключам полей фильтра"""
+    columns = {
+        filter_field_key(col): col for _, col in case_filter_fields(CaseFilterParams())
+    }
+    # Поля общих условий и фасеты без своего параметра фильтра
+    for col in (
+        RepairCaseEquipment.fault_date,
+        RepairCaseEquipment.section_mask,
+        RepairCaseEquipment.fault_discovered_at_id,
+    ):
+        columns[filter_field_key(col)] = col
+    columns[STATUS_FILTER_KEY] = RepairCaseEquipment.status
+    return columns
+
+
+class FacetColumn:
+    """
+    Колонка индекса: словарь значений, массив кодов значений по слотам
+    случаев и битовая маска слотов для каждого значения.
+    В колонке с большим числом значений (номера) вместо масок хранятся
+    множества слотов, а маска собирается только для запрошенных значений:
+    маска размером с индекс на каждое уникальное значение - это N^2 бит.
+    """
+
+    __slots__ = ("values", "codes", "bitmaps", "members", "slots")
+
+    def __init__(self):
+        self.values: list[Any] = []
+        self.codes: dict[Any, int] = {}
+        self.bitmaps: list[int] = []
+        self.members: list[set[int]] | None = None
+        self.slots = array("l")
+
+    def code_for(self, value: Any) -> int:
+        if value is None:
+            return NO_VALUE
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+            if self.members is None:
+                self.bitmaps.append(0)
+            else:
+                self.members.append(set())
+        return code
+
+    def set_slot(self, slot: int, value: Any) -> None:
+        """Записать значение слота (слот должен уже существовать)"""
+        old_code = self.slots[slot]
+        new_code = self.code_for(value)
+        if old_code == new_code:
+            return
+        if self.members is not None:
+            if old_code != NO_VALUE:
+                self.members[old_code].discard(slot)
+            if new_code != NO_VALUE:
+                self.members[new_code].add(slot)
+        else:
+            if old_code != NO_VALUE:
+                self.bitmaps[old_code] &= ~(1 << slot)
+            if new_code != NO_VALUE:
+                self.bitmaps[new_code] |= 1 << slot
+        self.slots[slot] = new_code
+
+    @staticmethod
+    def _mask_of(slots: Iterable[int]) -> int:
+        """Маска по номерам слотов: биты ставятся в bytearray, int - один раз"""
+        slots = list(slots)
+        if not slots:
+            return 0
+        bits = bytearray(max(slots) // 8 + 1)
+        for slot in slots:
+            bits[slot >> 3] |= 1 << (slot & 7)
+        return int.from_bytes(bits, "little")
+
+    @classmethod
+    def build(cls, values: Iterable[Any]) -> "FacetColumn":
+        """
+        Колонка по значениям слотов 0..N-1: сначала коды и слоты каждого
+        значения, затем каждая маска собирается в bytearray и переводится
+        в int один раз (OR по одному биту копировал бы всю маску)
+        """
+        column = cls()
+        codes, known = column.codes, column.values
+        slots = column.slots
+        positions: list[list[int]] = []
+
+        for slot, value in enumerate(values):
+            if value is None:
+                slots.append(NO_VALUE)
+                continue
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(known)
+                known.append(value)
+                positions.append([])
+            positions[code].append(slot)
+            slots.append(code)
+
+        if len(column.values) > FACET_INDEX_BITMAP_MAX_VALUES:
+            column.members = [set(slots) for slots in positions]
+            column.bitmaps = []
+        else:
+            column.bitmaps = [cls._mask_of(slots) for slots in positions]
+        return column
+
+    def mask_for(self, values: Iterable[Any]) -> int:
+        """Слоты, в которых значение колонки - одно из values"""
+        codes = [self.codes.get(value) for value in values]
+        codes = [code for code in codes if code is not None]
+        if self.members is not None:
+            return self._mask_of(slot for code in codes for slot in self.members[code])
+
+        mask = 0
+        for code in codes:
+            mask |= self.bitmaps[code]
+        return mask
+
+    def mask_containing(self, fragment: str) -> int:
+        """Слоты, в которых значение колонки содержит фрагмент (без учета регистра)"""
+        fragment = fragment.lower()
+        return self.mask_for(
+            value
+            for value in self.values
+            if value is not None and fragment in str(value).lower()
+        )
+
+    def counts(self, mask: int) -> dict[Any, int]:
+        """Число слотов маски по каждому значению колонки"""
+        if self.members is None and len(self.values) <= FACET_INDEX_BITMAP_MAX_VALUES:
+            counts = {}
+            for value, bitmap in zip(self.values, self.bitmaps):
+                count = (bitmap & mask).bit_count()
+                if count:
+                    counts[value] = count
+            return counts
+
+        # Много значений: дешевле пройти по слотам маски
+        by_code: dict[int, int] = {}
+        slots = self.slots
+        for slot in iter_slots(mask):
+            code = slots[slot]
+            if code != NO_VALUE:
+                by_code[code] = by_code.get(code, 0) + 1
+        return {self.values[code]: count for code, count in by_code.items()}
+
+
+class FacetIndex:
+    """
+    Колоночный индекс фильтруемых полей случаев в памяти воркера.
+    Каждому случаю соответствует слот, каждому значению поля - битовая
+    маска слотов (int), поэтому условия фильтра - это OR/AND масок,
+    а число случаев - popcount. Строится при запуске и обновляется
+    по уведомлениям об изменении случаев (после фиксации транзакции).
+    """
+
+    def __init__(self):
+        self._columns: dict[str, FacetColumn] = {}
+        self._case_slots: dict[int, int] = {}
+        self._free_slots: list[int] = []
+        self._live = 0
+        self._ready = False
+
+        # Названия элементов справочников: фасет -> {id: название}
+        self._names: dict[str, dict[int, str]] = {}
+
+        self._lock = asyncio.Lock()
+        self._rebuilding = False
+        self._dirty: set[int] = set()
+        self._refresher_task: asyncio.Task | None = None
+
+    @property
+    def ready(self) -> bool:
+        """Индекс построен и может отвечать на запросы"""
+        return self._ready
+
+    @staticmethod
+    def _build_stmt(columns: dict[str, Any], case_ids: list[int] | None = None):
+        stmt = (
+            select(
+                RepairCaseEquipment.id,
+                *(
+                    column.label(f"c{idx}")
+                    for idx, column in enumerate(columns.values())
+                ),
+            )
+            .select_from(RepairCaseEquipment)
+            .outerjoin(WarrantyWork, WarrantyWork.case_id == RepairCaseEquipment.id)
+            .outerjoin(WaybillDoc, WaybillDoc.case_id == RepairCaseEquipment.id)
+        )
+        if case_ids is not None:
+            stmt = stmt.where(RepairCaseEquipment.id.in_(case_ids))
+        return stmt
+
+    def _allocate_slot(self, case_id: int) -> int:
+        slot = self._case_slots.get(case_id)
+        if slot is not None:
+            return slot
+
+        if self._free_slots:
+            slot = self._free_slots.pop()
+        else:
+            slot = len(self._case_slots) + len(self._free_slots)
+            for column in self._columns.values():
+                column.slots.append(NO_VALUE)
+
+        self._case_slots[case_id] = slot
+        self._live |= 1 << slot
+        return slot
+
+    def _release_slot(self, case_id: int) -> None:
+        slot = self._case_slots.pop(case_id, None)
+        if slot is None:
+            return
+        for column in self._columns.values():
+            column.set_slot(slot, None)
+        self._live &= ~(1 << slot)
+        self._free_slots.append(slot)
+
+    @classmethod
+    def _build_fresh(cls, keys: list[str], rows: list) -> "FacetIndex":
+        """Новый индекс по строкам (CPU-bound, выполняется в отдельном потоке)"""
+        fresh = cls()
+        fresh._case_slots = {row[0]: slot for slot, row in enumerate(rows)}
+        fresh._columns = {
+            key: FacetColumn.build(row[idx + 1] for row in rows)
+            for idx, key in enumerate(keys)
+        }
+        fresh._live = (1 << len(rows)) - 1
+        return fresh
+
+    def _apply_row(self, keys: list[str], row) -> None:
+        slot = self._allocate_slot(row[0])
+        for idx, key in enumerate(keys):
+            self._columns[key].set_slot(slot, row[idx + 1])
+
+    async def rebuild(self) -> None:
+        """Построить индекс заново по всем случаям"""
+        started = time.perf_counter()
+        columns = indexed_columns()
+
+        async with self._lock:
+            self._rebuilding = True
+
+        try:
+            async with db_governor.session(LANE_BULK) as session:
+                result = await session.stream(self._build_stmt(columns))
+                rows = [row async for row in result]
+
+            # Построение не занимает цикл событий: запросы обслуживаются
+            fresh = await asyncio.to_thread(self._build_fresh, list(columns), rows)
+        except BaseException:
+            self._rebuilding = False
+            raise
+
+        # Готовый индекс подменяется целиком под блокировкой
+        async with self._lock:
+            self._columns = fresh._columns
+            self._case_slots = fresh._case_slots
+            self._free_slots = []
+            self._live = fresh._live
+            self._names = {}
+            self._ready = True
+            self._rebuilding = False
+
+            # Случаи, измененные во время построения, перечитываются
+            dirty, self._dirty = self._dirty, set()
+            if dirty:
+                await self._refresh(list(dirty))
+
+        logger.info(
+            f"Индекс фасетов построен: {len(self._case_slots)} случаев, "
+            f"{time.perf_counter() - started:.2f} с"
+        )
+
+    async def _refresh(self, case_ids: list[int]) -> None:
+        columns = indexed_columns()
+        keys = list(columns)
+
+        async with db_governor.session(LANE_INTERACTIVE) as session:
+            rows = (await session.execute(self._build_stmt(columns, case_ids))).all()
+
+        found = set()
+        for row in rows:
+            self._apply_row(keys, row)
+            found.add(row[0])
+
+        for case_id in set(case_ids) - found:
+            self._release_slot(case_id)
+
+    async def refresh_cases(self, case_ids: Iterable[int]) -> None:
+        """Перечитать случаи после изменения (удаленные убираются из индекса)"""
+        case_ids = list(case_ids)
+        if not case_ids:
+            return
+
+        async with self._lock:
+            if self._rebuilding:
+                self._dirty.update(case_ids)
+            elif self._ready:
+                await self._refresh(case_ids)
+
+    def invalidate_names(self) -> None:
+        """Названия справочников изменились - перечитать при следующем запросе"""
+        self._names = {}
+
+    async def _load_names(self, facets: list[dict]) -> None:
+        """Догрузить названия справочников, которых еще нет в индексе"""
+        missing = [
+            facet
+            for facet in facets
+            if "model" in facet and facet["name"] not in self._names
+        ]
+        if not missing:
+            return
+
+        names: dict[str, dict[int, str]] = {facet["name"]: {} for facet in missing}
+        stmt = union_all(
+            *(
+                select(
+                    literal(facet["name"], String).label("facet"),
+                    facet["model"].id.label("id"),
+                    facet["name_column"].label("name"),
+                )
+                for facet in missing
+            )
+        )
+        async with db_governor.session(LANE_INTERACTIVE) as session:
+            for name, item_id, item_name in (await session.execute(stmt)).all():
+                names[name][item_id] = item_name
+        self._names.update(names)
+
+    def _condition_masks(self, params: CaseFilterParams) -> tuple[int, dict[str, int]]:
+        """Маска общих условий (период, секция) и маски условий по полям"""
+        scope = self._live
+
+        if params.date_from or params.date_to:
+            dates = self._columns[filter_field_key(RepairCaseEquipment.fault_date)]
+            scope &= dates.mask_for(
+                value
+                for value in dates.values
+                if (not params.date_from or value >= params.date_from)
+                and (not params.date_to or value <= params.date_to)
+            )
+
+        if params.section_mask is not None and params.section_mask != 0:
+            sections = self._columns[filter_field_key(RepairCaseEquipment.section_mask)]
+            scope &= sections.mask_for([params.section_mask])
+
+        masks: dict[str, int] = {}
+        for p_val, col in case_filter_fields(params):
+            value = normalize_filter_value(p_val)
+            if value is None:
+                continue
+            values = value if isinstance(value, list) else [value]
+            key = filter_field_key(col)
+            mask = self._columns[key].mask_for(values)
+            masks[key] = masks.get(key, self._live) & mask
+
+        for fragment, col in substring_filter_fields(params):
+            fragment = normalize_filter_value(fragment)
+            if fragment is None:
+                continue
+            key = filter_field_key(col)
+            mask = self._columns[key].mask_containing(str(fragment).strip())
+            masks[key] = masks.get(key, self._live) & mask
+
+        if params.status:
+            clean_statuses = [s for s in params.status if s]
+            if clean_statuses:
+                masks[STATUS_FILTER_KEY] = self._columns[STATUS_FILTER_KEY].mask_for(
+                    clean_statuses
+                )
+
+        return scope, masks
+
+    def count_cases(self, params: CaseFilterParams) -> int | None:
+        """Число случаев, подходящих под фильтр (None - индекс не готов)"""
+        if not self._ready:
+            return None
+
+        mask, masks = self._condition_masks(params)
+        for field_mask in masks.values():
+            mask &= field_mask
+        return mask.bit_count()
+
+    async def facet_options(
+        self, facets: list[dict], params: CaseFilterParams
+    ) -> tuple[list[tuple[str, list[Any]]], dict[str, dict[str, int]]] | None:
+        """
+        Опции и количества по фасетам в формате FilterOptionsService:
+        каждый фасет - по всем условиям, кроме условия своего поля.
+        None - индекс не готов или фасет не проиндексирован.
+        """
+        if not self._ready:
+            return None
+
+        keys = [facet_field_key(facet) for facet in facets]
+        if any(key not in self._columns for key in keys):
+            return None
+
+        await self._load_names(facets)
+
+        scope, masks = self._condition_masks(params)
+        results = []
+        facet_counts: dict[str, dict[str, int]] = {}
+
+        for facet, key in zip(facets, keys):
+            mask = scope
+            for field_key, field_mask in masks.items():
+                if field_key != key:
+                    mask &= field_mask
+
+            counts = self._columns[key].counts(mask)
+            facet_counts[facet["name"]] = {
+                str(value): count for value, count in counts.items()
+            }
+
+            if "model" in facet:
+                names = self._names[facet["name"]]
+                items = [
+                    {"id": item_id, "name": names[item_id]}
+                    for item_id in counts
+                    if item_id in names
+                ]
+                # Как ORDER BY name в SQL: записи без названия - в конце
+                items.sort(key=lambda item: (item["name"] is None, item["name"] or ""))
+            else:
+                items = sorted(value for value in counts if str(value).strip() != "")
+            results.append((facet["name"], items))
+
+        return results, facet_counts
+
+    async def _refresh_loop(self, interval_seconds: int):
+        """Периодическое перестроение (подхватывает изменения в обход API)"""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await self.rebuild()
+            except Exception as e:
+                logger.error(f"Ошибка перестроения индекса фасетов: {e}")
+
+    def start_refresher(
+        self, interval_seconds: int = settings.FACET_INDEX_REBUILD_INTERVAL
+    ):
+        """Запустить периодическое перестроение (вызывается в lifespan приложения)"""
+        if self._refresher_task is None or self._refresher_task.done():
+            self._refresher_task = asyncio.create_task(
+                self._refresh_loop(interval_seconds)
+            )
+
+    async def stop_refresher(self):
+        """Остановить периодическое перестроение"""
+        if self._refresher_task is not None:
+            self._refresher_task.cancel()
+            try:
+                await self._refresher_task
+            except asyncio.CancelledError:
+                pass
+            self._refresher_task = None
+
+
+# Глобальный индекс фасетов (по одному в каждом воркере)
+facet_index = FacetIndex()
@@ -0,0 +1,230 @@
+import base64
+import hashlib
+from collections import Counter, defaultdict
+from typing import Any
+
+from sqlalchemy import String, and_, cast, delete, func, literal, select, tuple_
+from sqlalchemy import text, union_all
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from myapp.database.query_builders.query_filter_options import build_filtered_base_cte
+from myapp.models.filter_facets import FilterFacet, facet_search_key
+from myapp.models.repair_case_equipment import RepairCaseEquipment
+from myapp.utils.filters_utils import escape_like
+
+
+def facet_value_key(value: str) -> str:
+    """Ключ значения фасета (совпадает с md5() в PostgreSQL)"""
+    return hashlib.md5(value.encode("utf-8")).hexdigest()
+
+
+def encode_facet_cursor(value: str) -> str:
+    """Курсор страницы - последнее отданное значение"""
+    return base64.urlsafe_b64encode(value.encode("utf-8")).decode("ascii")
+
+
+def decode_facet_cursor(cursor: str) -> str:
+    try:
+        return base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+    except (ValueError, UnicodeError):
+        raise ValueError("Некорректный курсор")
+
+
+class FacetService:
+    """
+    Таблица фасетов filter_facets: (фасет, значение) -> число случаев.
+    Значения хранятся текстом (для справочников - id записи).
+    """
+
+    @staticmethod
+    async def get_case_values(
+        session: AsyncSession, facets: list[dict], case_id: int
+    ) -> dict[str, str | None]:
+        """Значения фасетов одного случая (пустой словарь, если случая нет)"""
+        base = build_filtered_base_cte(facets, [RepairCaseEquipment.id == case_id])
+        stmt = select(
+            *(
+                cast(base.c[facet["name"]], String).label(facet["name"])
+                for facet in facets
+            )
+        )
+        row = (await session.execute(stmt)).first()
+        return dict(row._mapping) if row else {}
+
+    @staticmethod
+    async def apply_case_change(
+        session: AsyncSession,
+        before: dict[str, str | None],
+        after: dict[str, str | None],
+    ) -> None:
+        """Перенести в таблицу фасетов разницу значений случая до и после изменения"""
+        delta: Counter[tuple[str, str]] = Counter()
+        for name, value in before.items():
+            if value is not None:
+                delta[(name, value)] -= 1
+        for name, value in after.items():
+            if value is not None:
+                delta[(name, value)] += 1
+
+        # Одинаковый порядок строк во всех транзакциях исключает взаимоблокировки
+        rows = sorted(
+            (
+                {
+                    "facet": name,
+                    "value_key": facet_value_key(value),
+                    "value": value,
+                    "count": change,
+                }
+                for (name, value), change in delta.items()
+                if change
+            ),
+            key=lambda row: (row["facet"], row["value_key"]),
+        )
+        if not rows:
+            return
+
+        stmt = insert(FilterFacet).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[FilterFacet.facet, FilterFacet.value_key],
+            set_={"count": FilterFacet.count + stmt.excluded.count},
+        )
+        await session.execute(stmt)
+
+        await session.execute(
+            delete(FilterFacet).where(
+                FilterFacet.count <= 0,
+                tuple_(FilterFacet.facet, FilterFacet.value_key).in_(
+                    [(row["facet"], row["value_key"]) for row in rows]
+                ),
+            )
+        )
+
+    @staticmethod
+    async def rebuild(session: AsyncSession, facets: list[dict]) -> None:
+        """Пересчитать таблицу фасетов по всем случаям"""
+        base = build_filtered_base_cte(facets)
+
+        # Изменения случаев, начатые до пересчета, успеют зафиксироваться,
+        # а начатые после - подождут его окончания
+        await session.execute(text("LOCK TABLE filter_facets IN EXCLUSIVE MODE"))
+
+        selects = []
+        for facet in facets:
+            column = base.c[facet["name"]]
+            value = cast(column, String)
+            selects.append(
+                select(
+                    literal(facet["name"], String).label("facet"),
+                    func.md5(value).label("value_key"),
+                    value.label("value"),
+                    func.count().label("count"),
+                )
+                .where(column.isnot(None))
+                .group_by(value)
+            )
+
+        await session.execute(delete(FilterFacet))
+        await session.execute(
+            insert(FilterFacet).from_select(
+                ["facet", "value_key", "value", "count"], union_all(*selects)
+            )
+        )
+
+    @staticmethod
+    async def is_empty(session: AsyncSession) -> bool:
+        """Таблица фасетов еще не заполнена"""
+        stmt = select(FilterFacet.facet).limit(1)
+        return (await session.execute(stmt)).first() is None
+
+    @staticmethod
+    async def search_values(
+        session: AsyncSession,
+        facet: str,
+        query: str = "",
+        substring: bool = False,
+        limit: int = 50,
+        cursor: str | None = None,
+    ) -> tuple[list[tuple[str, int]], str | None]:
+        """
+        Страница значений фасета по возрастанию, с поиском по префиксу
+        (по индексу) или по подстроке. Возвращает значения и курсор
+        следующей страницы.
+        """
+        search_key = facet_search_key(FilterFacet.value)
+        value_order = FilterFacet.value.collate("C")
+
+        stmt = select(FilterFacet.value, FilterFacet.count).where(
+            FilterFacet.facet == facet, FilterFacet.count > 0
+        )
+
+        if query:
+            pattern = escape_like(query.lower())
+            pattern = f"%{pattern}%" if substring else f"{pattern}%"
+            stmt = stmt.where(search_key.like(pattern, escape="\\"))
+
+        if cursor is not None:
+            last_value = literal(decode_facet_cursor(cursor), String)
+            stmt = stmt.where(
+                tuple_(search_key, value_order)
+                > tuple_(facet_search_key(last_value), last_value.collate("C"))
+            )
+
+        stmt = stmt.order_by(search_key, value_order).limit(limit + 1)
+        rows = [(value, count) for value, count in (await session.execute(stmt)).all()]
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_facet_cursor(rows[-1][0])
+
+        return rows, next_cursor
+
+    @staticmethod
+    async def read(
+        session: AsyncSession, facets: list[dict]
+    ) -> list[tuple[str, list[Any]]] | None:
+        """
+        Опции фильтров из таблицы фасетов в формате задач FilterOptionsService.
+        None - таблица еще не заполнена.
+        """
+        if await FacetService.is_empty(session):
+            return None
+
+        values: dict[str, list[Any]] = defaultdict(list)
+
+        value_names = [facet["name"] for facet in facets if "model" not in facet]
+        if value_names:
+            stmt = (
+                select(FilterFacet.facet, FilterFacet.value)
+                .where(FilterFacet.facet.in_(value_names), FilterFacet.count > 0)
+                .order_by(FilterFacet.facet, FilterFacet.value)
+            )
+            for name, value in (await session.execute(stmt)).all():
+                if value.strip() != "":
+                    values[name].append(value)
+
+        # Названия справочников берутся из самих справочников
+        references = [
+            select(
+                literal(facet["name"], String).label("facet"),
+                facet["model"].id.label("id"),
+                facet["name_column"].label("name"),
+            ).join(
+                FilterFacet,
+                and_(
+                    FilterFacet.facet == facet["name"],
+                    FilterFacet.value == cast(facet["model"].id, String),
+                    FilterFacet.count > 0,
+                ),
+            )
+            for facet in facets
+            if "model" in facet
+        ]
+        if references:
+            subquery = union_all(*references).subquery()
+            stmt = select(subquery).order_by(subquery.c.facet, subquery.c.name)
+            for name, item_id, item_name in (await session.execute(stmt)).all():
+                values[name].append({"id": item_id, "name": item_name})
+
+        return [(facet["name"], values[facet["name"]]) for facet in facets]
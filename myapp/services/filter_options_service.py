@@ -1,8 +1,17 @@
 import asyncio
 from typing import Any
+import logging
 from sqlalchemy import select, and_, distinct
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from myapp.database.base import async_session_maker
+from myapp.config import settings
+from myapp.database.base import (
+    LANE_BULK,
+    LANE_INTERACTIVE,
+    db_governor,
+    trigram_available,
+)
 from myapp.models.repair_case_equipment import RepairCaseEquipment
 from myapp.models.warranty_work import (
     WarrantyWork,
@@ -25,17 +34,50 @@ from myapp.models.auxiliaries import (
 )
 from myapp.models.equipment_malfunctions import Equipment, Malfunction
 from myapp.models.waybill_docs import WaybillDoc, ShippingProvider
-from myapp.schemas.filters import FilterOptionsResponse, CaseFilterParams
+from myapp.schemas.filters import (
+    CaseFilterParams,
+    FacetValueItem,
+    FacetValuesResponse,
+    FilterOptionsResponse,
+    TypeaheadResponse,
+)
 from myapp.database.query_builders.query_case_filters import (
-    build_repair_case_conditions,
-    build_warranty_work_conditions,
-    build_waybill_doc_conditions,
+    build_facet_filter_conditions,
+)
+from myapp.database.query_builders.query_filter_options import (
+    STATUS_FACET,
+    build_facet_counts_stmts,
+    build_filter_options_stmt,
+    build_near_set_stmt,
+    build_typeahead_stmt,
+    case_ids_condition,
+    facet_field_key,
 )
-from myapp.services.cache_service import cached
+from myapp.services.cache_bus_service import invalidation_bus
+from myapp.services.cache_service import cache, cached
+from myapp.services.facet_index_service import facet_index
+from myapp.services.facet_service import FacetService
+from myapp.constants.cache_tags import CASE_TAGS, FILTER_OPTIONS_TAGS
 from myapp.services.case_status_service import CaseStatusService
 from myapp.constants.filter_constants import (
-    DB_SEMAPHORE_LIMIT,
+    DYNAMIC_FILTER_CACHE_MAX_BYTES,
+    DYNAMIC_FILTER_CACHE_MAX_ENTRIES,
+    FACET_COUNTS_TIMEOUT_MS,
+    FACET_VALUES_PAGE_SIZE,
+    FILTER_OPTION_TASK_TIMEOUT_MS,
+    FILTER_OPTIONS_QUERY_TIMEOUT_MS,
     FILTER_TASK_CONFIGS,
+    LARGE_FACETS,
+    NEAR_SET_CACHE_MAX_BYTES,
+    NEAR_SET_CACHE_MAX_ENTRIES,
+    NEAR_SET_MAX_IDS,
+    NEAR_SET_NAMESPACE,
+    NEAR_SET_TTL,
+    STATIC_OPTIONS_STALE_TTL,
+    TYPEAHEAD_FIELDS,
+    TYPEAHEAD_LIMIT,
+    TYPEAHEAD_MIN_QUERY_LENGTH,
+    TYPEAHEAD_TIMEOUT_MS,
 )
 from myapp.utils.filters_utils import (
     process_query_results,
@@ -45,18 +87,28 @@ from myapp.utils.filters_utils import (
     get_used_items_with_intermediate_join,
 )
 
+logger = logging.getLogger(__name__)
+
+cache.configure_namespace(
+    NEAR_SET_NAMESPACE, NEAR_SET_CACHE_MAX_ENTRIES, NEAR_SET_CACHE_MAX_BYTES
+)
+
+# Ключ в degraded_facets: не посчитаны количества случаев (facet_counts)
+FACET_COUNTS_DEGRADED = "facet_counts"
+
+
+def is_complete_response(response: FilterOptionsResponse) -> bool:
+    """Кешируются только полные ответы: неполный пересчитается при следующем запросе"""
+    return not response.degraded
+
 
 class FilterOptionsService:
     """Сервис для получения опций фильтров"""
 
-    _db_semaphore = asyncio.Semaphore(DB_SEMAPHORE_LIMIT)
-
     @staticmethod
-    @cached(ttl_seconds=600)
-    async def get_filter_options() -> FilterOptionsResponse:
-
-        # Список справочников для быстрой загрузки
-        reference_tasks = [
+    def static_option_tasks() -> list[dict]:
+        """Задачи статических опций фильтров (по всем случаям)"""
+        return [
             {
                 "name": "regional_centers",
                 "func": FilterOptionsService._get_used_items_with_case_join,
@@ -374,15 +426,224 @@ class FilterOptionsService:
             },
         ]
 
-        # Параллельное выполнение задач
-        task_results = await FilterOptionsService._execute_parallel_tasks_optimized(
-            async_session_maker, reference_tasks
+    @staticmethod
+    @cached(
+        ttl_seconds=600,
+        stale_ttl_seconds=STATIC_OPTIONS_STALE_TTL,
+        tags=FILTER_OPTIONS_TAGS,
+        should_cache=is_complete_response,
+    )
+    async def get_filter_options(compact: bool = False) -> FilterOptionsResponse:
+        """
+        Статические опции фильтров из таблицы фасетов (filter_facets).
+        Пока таблица не заполнена, опции считаются по всем случаям.
+        compact - без фасетов с большим числом значений (LARGE_FACETS),
+        их значения запрашиваются постранично через search_facet_values.
+        """
+        tasks = FilterOptionsService.static_option_tasks()
+        if compact:
+            tasks = [cfg for cfg in tasks if cfg["name"] not in LARGE_FACETS]
+
+        async with db_governor.session(
+            LANE_BULK, FILTER_OPTIONS_QUERY_TIMEOUT_MS
+        ) as session:
+            task_results = await FacetService.read(
+                session, [FilterOptionsService.facet_from_task(cfg) for cfg in tasks]
+            )
+
+        degraded = []
+        if task_results is None:
+            task_results, degraded = await FilterOptionsService._execute_tasks(tasks)
+
+        return FilterOptionsService._build_filter_response(task_results, degraded)
+
+    @staticmethod
+    def static_facets() -> list[dict]:
+        """Фасеты, которые хранятся в таблице filter_facets"""
+        return [
+            FilterOptionsService.facet_from_task(cfg)
+            for cfg in FilterOptionsService.static_option_tasks()
+        ]
+
+    @staticmethod
+    async def search_facet_values(
+        facet: str,
+        query: str = "",
+        substring: bool = False,
+        limit: int = FACET_VALUES_PAGE_SIZE,
+        cursor: str | None = None,
+    ) -> FacetValuesResponse:
+        """Страница значений фасета с поиском по префиксу или подстроке"""
+        value_facets = {
+            facet["name"]
+            for facet in FilterOptionsService.static_facets()
+            if "column" in facet
+        }
+        if facet not in value_facets:
+            raise LookupError(f"Фасет {facet} не поддерживает поиск значений")
+
+        async with db_governor.session(LANE_INTERACTIVE) as session:
+            rows, next_cursor = await FacetService.search_values(
+                session, facet, query, substring, limit, cursor
+            )
+
+        return FacetValuesResponse(
+            facet=facet,
+            items=[FacetValueItem(value=value, count=count) for value, count in rows],
+            next_cursor=next_cursor,
+        )
+
+    @staticmethod
+    async def typeahead(
+        field: str, query: str, limit: int = TYPEAHEAD_LIMIT
+    ) -> TypeaheadResponse:
+        """Подсказки по фрагменту номера (поиск по trigram-индексу колонки)"""
+        column = TYPEAHEAD_FIELDS.get(field)
+        if column is None:
+            raise LookupError(f"Поле {field} не поддерживает поиск по фрагменту")
+        if len(query.strip()) < TYPEAHEAD_MIN_QUERY_LENGTH:
+            raise ValueError(
+                f"Фрагмент должен быть не короче {TYPEAHEAD_MIN_QUERY_LENGTH} символов"
+            )
+
+        stmt = build_typeahead_stmt(column, query, limit, trigram_available())
+        async with db_governor.session(
+            LANE_INTERACTIVE, TYPEAHEAD_TIMEOUT_MS
+        ) as session:
+            rows = (await session.execute(stmt)).all()
+
+        return TypeaheadResponse(
+            field=field,
+            items=[FacetValueItem(value=value, count=count) for value, count in rows],
+        )
+
+    @staticmethod
+    async def snapshot_case_facets(
+        session: AsyncSession, case_id: int
+    ) -> dict[str, str | None]:
+        """
+        Значения фасетов случая перед изменением. Строка случая блокируется
+        до конца транзакции: иначе две параллельные правки одного случая
+        прочитали бы одно и то же "до" и обе применили бы свою разницу
+        """
+        await session.execute(
+            select(RepairCaseEquipment.id)
+            .where(RepairCaseEquipment.id == case_id)
+            .with_for_update()
+        )
+        return await FacetService.get_case_values(
+            session, FilterOptionsService.static_facets(), case_id
+        )
+
+    @staticmethod
+    async def update_case_facets(
+        session: AsyncSession, case_id: int, before: dict[str, str | None]
+    ) -> None:
+        """
+        Обновить хранимый статус и таблицу фасетов после изменения случая
+        (в той же транзакции)
+        """
+        await session.flush()
+        await CaseStatusService.refresh_status(session, case_id)
+        after = await FacetService.get_case_values(
+            session, FilterOptionsService.static_facets(), case_id
+        )
+        await FacetService.apply_case_change(session, before, after)
+
+        if settings.FACET_INDEX_ENABLED:
+            await invalidation_bus.publish_cases(session, case_id)
+
+    @staticmethod
+    async def rebuild_facets(session: AsyncSession) -> None:
+        """Пересчитать таблицу фасетов по всем случаям"""
+        await FacetService.rebuild(session, FilterOptionsService.static_facets())
+
+    @staticmethod
+    async def ensure_facets_built() -> None:
+        """Заполнить таблицу фасетов при первом запуске"""
+        async with db_governor.session(LANE_BULK) as session:
+            if await FacetService.is_empty(session):
+                await FilterOptionsService.rebuild_facets(session)
+                await session.commit()
+
+    @staticmethod
+    def facet_from_task(config) -> dict:
+        """Описание фасета для общего запроса по конфигурации задачи"""
+        args = config["args"]
+
+        if config["name"] == STATUS_FACET:
+            return {"name": STATUS_FACET}
+
+        # Справочник: (модель, внешний ключ, колонка названия, ...)
+        if hasattr(args[0], "__table__"):
+            return {
+                "name": config["name"],
+                "model": args[0],
+                "fk_column": args[1],
+                "name_column": args[2],
+            }
+
+        return {"name": config["name"], "column": args[0]}
+
+    @staticmethod
+    async def _execute_single_query(
+        task_configs, conditions=None, facet_conditions=None
+    ):
+        """
+        Все фасеты одним запросом на одном подключении. Если запрос
+        не уложился в ограничение времени, фасеты считаются параллельными
+        задачами, и до пустых опций урезаются только медленные из них.
+        """
+        facets = [FilterOptionsService.facet_from_task(cfg) for cfg in task_configs]
+        stmt = build_filter_options_stmt(facets, conditions, facet_conditions)
+
+        try:
+            async with db_governor.session(
+                LANE_BULK, FILTER_OPTIONS_QUERY_TIMEOUT_MS
+            ) as session:
+                row = (await session.execute(stmt)).one()
+        except DBAPIError as e:
+            logger.warning(f"Общий запрос опций фильтров прерван: {e}")
+            return await FilterOptionsService._execute_parallel_tasks_optimized(
+                task_configs
+            )
+
+        results = []
+        for facet in facets:
+            values = row._mapping[facet["name"]] or []
+            if "model" not in facet:
+                values = [v for v in values if str(v).strip() != ""]
+            results.append((facet["name"], values))
+
+        return results, []
+
+    @staticmethod
+    async def _execute_tasks(task_configs, conditions=None, facet_conditions=None):
+        """
+        Выполняет задачи опций фильтров: одним агрегирующим запросом
+        или, если он отключен в настройках, параллельными запросами
+        (условия для них уже переданы в аргументах задач).
+        Возвращает результаты и список фасетов, которые не удалось посчитать.
+        """
+        if settings.FILTER_OPTIONS_SINGLE_QUERY:
+            return await FilterOptionsService._execute_single_query(
+                task_configs, conditions, facet_conditions
+            )
+
+        return await FilterOptionsService._execute_parallel_tasks_optimized(
+            task_configs
         )
 
-        return FilterOptionsService._build_filter_response(task_results)
+    @staticmethod
+    def _facet_task_conditions(config, conditions, facet_conditions) -> list:
+        """Условия для задачи фасета: общие и по всем полям, кроме своего"""
+        own_key = facet_field_key(FilterOptionsService.facet_from_task(config))
+        return conditions + [
+            condition for key, condition in facet_conditions.items() if key != own_key
+        ]
 
     @staticmethod
-    def _build_tasks_from_configs(configs, conditions):
+    def _build_tasks_from_configs(configs, conditions, facet_conditions):
         """Строит конфигурации задач для параллельного выполнения из констант"""
 
         tasks = []
@@ -390,7 +651,11 @@ class FilterOptionsService:
             func_name = config["func"].split(".")[-1]
             func = getattr(FilterOptionsService, func_name)
 
-            args = config["args"] + [conditions]
+            args = config["args"] + [
+                FilterOptionsService._facet_task_conditions(
+                    config, conditions, facet_conditions
+                )
+            ]
 
             tasks.append(
                 {
@@ -403,70 +668,223 @@ class FilterOptionsService:
         return tasks
 
     @staticmethod
-    def _build_filter_response(task_results) -> FilterOptionsResponse:
-        """Формирует объект FilterOptionsResponse из результатов параллельных задач"""
+    def _build_filter_response(task_results, degraded=()) -> FilterOptionsResponse:
+        """
+        Формирует объект FilterOptionsResponse из результатов параллельных задач.
+        degraded - фасеты, которые не удалось посчитать (отдаются пустыми).
+        """
         result_dict = {}
         for task_name, items in task_results:
             result_dict[task_name] = items
 
-        return FilterOptionsResponse(**result_dict)
+        return FilterOptionsResponse(
+            **result_dict,
+            degraded=bool(degraded),
+            degraded_facets=list(degraded),
+        )
 
     @staticmethod
-    @cached()
+    @cached(
+        max_entries=DYNAMIC_FILTER_CACHE_MAX_ENTRIES,
+        max_bytes=DYNAMIC_FILTER_CACHE_MAX_BYTES,
+        tags=FILTER_OPTIONS_TAGS,
+        should_cache=is_complete_response,
+    )
     async def get_dynamic_filter_options_optimized(
         params: CaseFilterParams,
     ) -> FilterOptionsResponse:
-        """Получает опции фильтров с учетом уже выбранных значений"""
-
-        # Условия фильтрации
-        repair_conditions = build_repair_case_conditions(params)
-        warranty_conditions = build_warranty_work_conditions(params)
-        waybill_conditions = build_waybill_doc_conditions(params)
-        combined_conditions = (
-            repair_conditions + warranty_conditions + waybill_conditions
+        """
+        Получает опции фильтров с учетом уже выбранных значений.
+        Опции каждого поля считаются по условиям всех остальных полей,
+        чтобы выбор можно было расширить, не сбрасывая его.
+        """
+
+        # Условия фильтрации: общие и по полям
+        conditions, facet_conditions = build_facet_filter_conditions(params)
+
+        # Все фасеты считаются только по случаям-кандидатам
+        near_ids = await FilterOptionsService._get_near_set(
+            params, conditions, facet_conditions
         )
+        if near_ids is not None:
+            conditions = conditions + [case_ids_condition(near_ids)]
 
         tasks = FilterOptionsService._build_tasks_from_configs(
-            FILTER_TASK_CONFIGS, combined_conditions
+            FILTER_TASK_CONFIGS, conditions, facet_conditions
         )
 
+        status_config = {"name": STATUS_FACET, "args": [None]}
         tasks.append(
             {
-                "name": "statuses",
+                "name": STATUS_FACET,
                 "func": FilterOptionsService._get_distinct_statuses,
-                "args": [combined_conditions],
+                "args": [
+                    FilterOptionsService._facet_task_conditions(
+                        status_config, conditions, facet_conditions
+                    )
+                ],
             }
         )
 
-        task_results = await FilterOptionsService._execute_parallel_tasks_optimized(
-            async_session_maker, tasks
+        task_results, degraded = await FilterOptionsService._execute_tasks(
+            tasks, conditions, facet_conditions
         )
 
-        return FilterOptionsService._build_filter_response(task_results)
+        facet_counts = await FilterOptionsService._execute_facet_counts(
+            tasks, conditions, facet_conditions
+        )
+        if facet_counts is None:
+            degraded = degraded + [FACET_COUNTS_DEGRADED]
+
+        response = FilterOptionsService._build_filter_response(task_results, degraded)
+        response.facet_counts = facet_counts or {}
+        return response
 
     @staticmethod
-    async def _execute_parallel_tasks_optimized(session_factory, task_configs):
-        """Запускает все задачи сразу, но их количество ограничивается глобальным семафором"""
+    async def _get_near_set(
+        params: CaseFilterParams, conditions: list, facet_conditions: dict
+    ) -> list[int] | None:
+        """
+        Случаи-кандидаты (near set): не прошедшие не больше одного условия
+        по полям. Пока UI добавляет по одному условию, набор нового
+        состояния - подмножество набора предыдущего, поэтому он ищется
+        среди id закешированного набора более широкого состояния,
+        а не по всем таблицам. None - набор не сужает выборку.
+        """
+        # С одним условием по полю в наборе все случаи базовой выборки
+        if len(facet_conditions) < 2:
+            return None
 
-        async def run_task(config):
-            async with session_factory() as session:
-                all_args = [session] + config["args"]
-                return await FilterOptionsService._execute_with_semaphore(
-                    config["func"],
-                    all_args,
-                    config.get("kwargs", {}),
-                    operation_name=config["name"],
+        parents = []
+        for fingerprint in params.parent_fingerprints():
+            parent_ids = await cache.get(fingerprint, NEAR_SET_NAMESPACE)
+            if parent_ids is not None:
+                parents.append(parent_ids)
+        parent_ids = min(parents, key=len) if parents else None
+
+        versions = await cache.tag_versions(CASE_TAGS)
+        stmt = build_near_set_stmt(conditions, facet_conditions, parent_ids)
+        try:
+            async with db_governor.session(
+                LANE_BULK, FILTER_OPTIONS_QUERY_TIMEOUT_MS
+            ) as session:
+                near_ids = list((await session.execute(stmt)).scalars())
+        except DBAPIError as e:
+            # Без набора кандидатов опции считаются по всей выборке
+            logger.warning(f"Поиск случаев-кандидатов прерван: {e}")
+            return None
+
+        if len(near_ids) > NEAR_SET_MAX_IDS:
+            return None
+
+        await cache.set(
+            params.fingerprint(),
+            near_ids,
+            NEAR_SET_TTL,
+            NEAR_SET_NAMESPACE,
+            tags=CASE_TAGS,
+            versions=versions,
+        )
+        return near_ids
+
+    @staticmethod
+    async def get_index_filter_options(
+        params: CaseFilterParams,
+    ) -> FilterOptionsResponse | None:
+        """
+        Динамические опции по индексу фасетов в памяти (None - индекс не готов).
+        Не кешируются: индекс обновляется уведомлениями чуть позже фиксации,
+        и закешированный ответ мог бы пережить инвалидацию.
+        """
+        configs = FILTER_TASK_CONFIGS + [{"name": STATUS_FACET, "args": [None]}]
+        facets = [FilterOptionsService.facet_from_task(cfg) for cfg in configs]
+
+        result = await facet_index.facet_options(facets, params)
+        if result is None:
+            return None
+
+        task_results, facet_counts = result
+        response = FilterOptionsService._build_filter_response(task_results)
+        response.facet_counts = facet_counts
+        return response
+
+    @staticmethod
+    async def _execute_facet_counts(
+        task_configs, conditions=None, facet_conditions=None
+    ) -> dict[str, dict[str, int]] | None:
+        """
+        Число подходящих случаев по каждому значению фасетов: один
+        GROUPING SETS запрос на таблицу, под общим ограничением времени.
+        При превышении ограничения возвращается None.
+        """
+        facets = [FilterOptionsService.facet_from_task(cfg) for cfg in task_configs]
+        counts: dict[str, dict[str, int]] = {}
+
+        try:
+            async with db_governor.session(
+                LANE_BULK, FACET_COUNTS_TIMEOUT_MS
+            ) as session:
+                statements = build_facet_counts_stmts(
+                    facets, conditions, facet_conditions
                 )
+                for names, stmt in statements:
+                    for row in (await session.execute(stmt)).all():
+                        # Сброшенный бит маски - колонка, по которой сгруппирована строка
+                        for idx, name in enumerate(names):
+                            bit = 1 << (len(names) - 1 - idx)
+                            if not row.grouping_mask & bit and row[idx] is not None:
+                                cases = row._mapping[f"cases_{idx}"]
+                                # Значение есть только в строках, отсеянных
+                                # условиями других полей
+                                if cases:
+                                    counts.setdefault(name, {})[row[idx]] = cases
+                                break
+        except DBAPIError as e:
+            logger.warning(f"Подсчет случаев по фасетам прерван: {e}")
+            return None
 
-        tasks = [run_task(cfg) for cfg in task_configs]
-        return await asyncio.gather(*tasks)
+        return counts
 
     @staticmethod
-    async def _execute_with_semaphore(func, args, kwargs, operation_name: str):
-        """Выполняет функцию только после получения разрешения от семафора"""
-        async with FilterOptionsService._db_semaphore:
-            result = await func(*args, **kwargs)
-            return operation_name, result
+    async def _execute_parallel_tasks_optimized(task_configs):
+        """
+        Запускает все задачи сразу, но их количество ограничивает общий контроль
+        допуска к БД. Каждый запрос ограничен по времени: не уложившийся фасет
+        отдается пустым. Отмена запроса клиента или непредвиденная ошибка
+        задачи отменяет всю группу, и возвращается то, что успело посчитаться.
+        Возвращает результаты и список непосчитанных фасетов.
+        """
+        results: dict[str, Any] = {}
+
+        async def run_task(config):
+            try:
+                async with db_governor.session(
+                    LANE_BULK, FILTER_OPTION_TASK_TIMEOUT_MS
+                ) as session:
+                    all_args = [session] + config["args"]
+                    results[config["name"]] = await config["func"](
+                        *all_args, **config.get("kwargs", {})
+                    )
+            except DBAPIError as e:
+                logger.warning(f"Опции фильтра {config['name']} не посчитаны: {e}")
+
+        try:
+            async with asyncio.TaskGroup() as group:
+                for cfg in task_configs:
+                    group.create_task(run_task(cfg))
+        except* Exception as errors:
+            logger.error(
+                "Расчет опций фильтров прерван ошибкой задачи",
+                exc_info=errors.exceptions[0],
+            )
+
+        task_results = [
+            (cfg["name"], results[cfg["name"]])
+            for cfg in task_configs
+            if cfg["name"] in results
+        ]
+        degraded = [cfg["name"] for cfg in task_configs if cfg["name"] not in results]
+        return task_results, degraded
 
     @staticmethod
     async def _get_used_items_with_case_join(
@@ -588,11 +1006,11 @@ class FilterOptionsService:
         session,
         filtered_conditions=None,
     ) -> list[Any]:
-        """Получить уникальные вычисленные статусы из базы данных"""
+        """Получить уникальные статусы случаев (хранимая колонка)"""
 
-        status_subquery = CaseStatusService.build_status_subquery()
-
-        stmt = select(distinct(status_subquery)).select_from(RepairCaseEquipment)
+        stmt = select(distinct(RepairCaseEquipment.status)).select_from(
+            RepairCaseEquipment
+        )
 
         if filtered_conditions:
             stmt = stmt.outerjoin(
@@ -2,9 +2,13 @@ import asyncio
 from typing import Any
 from sqlalchemy import select, asc
 
-from myapp.database.base import async_session_maker
+from myapp.database.base import LANE_BULK, db_governor
 from myapp.services.cache_service import cached
-from myapp.constants.filter_constants import DB_SEMAPHORE_LIMIT
+from myapp.constants.cache_tags import CASE_FORM_REFERENCES_TAGS
+from myapp.constants.filter_constants import (
+    REFERENCES_QUERY_TIMEOUT_MS,
+    STATIC_OPTIONS_STALE_TTL,
+)
 from myapp.models.auxiliaries import (
     RegionalCenter,
     LocomotiveModel,
@@ -32,8 +36,6 @@ from myapp.models.waybill_docs import ShippingProvider
 class ReferenceService:
     """Сервис для работы со справочниками"""
 
-    _db_semaphore = asyncio.Semaphore(DB_SEMAPHORE_LIMIT)
-
     @staticmethod
     def _map_to_id_name(rows) -> list[dict]:
         """Вспомогательная функция для формирования стандартного списка id/name"""
@@ -41,19 +43,28 @@ class ReferenceService:
 
     @classmethod
     async def _execute_tasks(cls, tasks: list[tuple[str, Any]]) -> dict[str, Any]:
-        """Метод для параллельного выполнения запросов"""
+        """
+        Метод для параллельного выполнения запросов. Ошибка одного запроса
+        (или отмена запроса клиента) отменяет остальные.
+        """
 
         async def run_query(name, stmt):
-            async with cls._db_semaphore:
-                async with async_session_maker() as session:
-                    result = await session.execute(stmt)
-                    return name, result.all()
+            async with db_governor.session(
+                LANE_BULK, REFERENCES_QUERY_TIMEOUT_MS
+            ) as session:
+                result = await session.execute(stmt)
+                return name, result.all()
 
-        results = await asyncio.gather(*(run_query(name, stmt) for name, stmt in tasks))
-        return {name: rows for name, rows in results}
+        async with asyncio.TaskGroup() as group:
+            running = [group.create_task(run_query(name, stmt)) for name, stmt in tasks]
+        return dict(task.result() for task in running)
 
     @staticmethod
-    @cached(ttl_seconds=600)
+    @cached(
+        ttl_seconds=600,
+        stale_ttl_seconds=STATIC_OPTIONS_STALE_TTL,
+        tags=CASE_FORM_REFERENCES_TAGS,
+    )
     async def get_case_form_references() -> dict[str, Any]:
         """Получить ВСЕ справочники для формы создания/редактирования случая"""
 
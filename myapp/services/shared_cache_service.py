@@ -0,0 +1,366 @@
+import asyncio
+import logging
+import pickle
+import sqlite3
+import threading
+import time
+from typing import Any, Dict
+
+from myapp.config import settings
+from myapp.services.cache_backend import (
+    DEFAULT_NAMESPACE,
+    CacheBackend,
+    CacheEntry,
+)
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires REAL NOT NULL,
+    stale_until REAL NOT NULL,
+    accessed REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS idx_cache_entries_lru ON cache_entries (namespace, accessed);
+CREATE TABLE IF NOT EXISTS cache_tags (
+    tag TEXT NOT NULL,
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    PRIMARY KEY (tag, namespace, key),
+    FOREIGN KEY (namespace, key) REFERENCES cache_entries (namespace, key)
+        ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_cache_tags_entry ON cache_tags (namespace, key);
+CREATE TABLE IF NOT EXISTS cache_tag_versions (
+    tag TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+"""
+
+# Не чаще, чем раз в столько секунд, обновляем время доступа (для LRU)
+ACCESS_TOUCH_INTERVAL = 5
+
+
+class SharedCache(CacheBackend):
+    """
+    Общий для воркеров одного хоста кеш в файле SQLite.
+    Значения хранятся сериализованными (pickle), поэтому переживают
+    перезапуск воркеров. Запросы к файлу выполняются в отдельном потоке.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = settings.CACHE_MAX_ENTRIES,
+        max_bytes: int = settings.CACHE_MAX_BYTES,
+    ):
+        super().__init__()
+        self._path = path
+        self._default_limits = (max_entries, max_bytes)
+        self._limits: Dict[str, tuple[int, int]] = {}
+        self._conn: sqlite3.Connection | None = None
+        self._conn_lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Ленивое открытие файла кеша"""
+        if self._conn is None:
+            conn = sqlite3.connect(
+                self._path,
+                timeout=10,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    async def _run(self, func, *args):
+        """Выполнить операцию над файлом кеша вне цикла событий"""
+
+        def call():
+            with self._conn_lock:
+                return func(self._connection(), *args)
+
+        return await asyncio.to_thread(call)
+
+    def configure_namespace(
+        self,
+        namespace: str,
+        max_entries: int | None = None,
+        max_bytes: int | None = None,
+    ) -> None:
+        """Задать ограничения для пространства имен"""
+        current = self._limits.get(namespace, self._default_limits)
+        self._limits[namespace] = (max_entries or current[0], max_bytes or current[1])
+
+    @staticmethod
+    def _read_versions(conn: sqlite3.Connection, tags) -> Dict[str, int]:
+        tags = list(tags)
+        if not tags:
+            return {}
+        rows = conn.execute(
+            f"SELECT tag, version FROM cache_tag_versions "
+            f"WHERE tag IN ({','.join('?' * len(tags))})",
+            tags,
+        ).fetchall()
+        versions = dict(rows)
+        return {tag: versions.get(tag, 0) for tag in tags}
+
+    async def tag_versions(self, tags) -> Dict[str, int]:
+        """Текущие версии тегов (общие для всех воркеров)"""
+        return await self._run(self._read_versions, tuple(tags))
+
+    @staticmethod
+    def _read_entry(conn: sqlite3.Connection, namespace: str, key: str):
+        now = time.time()
+        row = conn.execute(
+            "SELECT value, size, expires, stale_until, accessed FROM cache_entries "
+            "WHERE namespace = ? AND key = ?",
+            (namespace, key),
+        ).fetchone()
+        if row is None or now >= max(row[2], row[3]):
+            return None
+
+        if now - row[4] > ACCESS_TOUCH_INTERVAL:
+            conn.execute(
+                "UPDATE cache_entries SET accessed = ? WHERE namespace = ? AND key = ?",
+                (now, namespace, key),
+            )
+        return row
+
+    async def get_entry(
+        self, key: str, namespace: str = DEFAULT_NAMESPACE
+    ) -> CacheEntry | None:
+        """Получить запись целиком, в том числе устаревшую в пределах stale-окна"""
+        row = await self._run(self._read_entry, namespace, key)
+        if row is None:
+            return None
+
+        return CacheEntry(
+            value=pickle.loads(row[0]),
+            expires=row[2],
+            size=row[1],
+            stale_until=row[3],
+        )
+
+    async def get(self, key: str, namespace: str = DEFAULT_NAMESPACE) -> Any | None:
+        """Получить свежее значение из кеша"""
+        entry = await self.get_entry(key, namespace)
+        if entry is None or not entry.is_fresh:
+            return None
+        return entry.value
+
+    def _write_entry(
+        self,
+        conn: sqlite3.Connection,
+        namespace: str,
+        key: str,
+        blob: bytes,
+        expires: float,
+        stale_until: float,
+        tags: tuple,
+        versions: Dict[str, int] | None,
+    ) -> int | None:
+        """Записать значение, возвращает число вытесненных записей (None - не записано)"""
+        max_entries, max_bytes = self._limits.get(namespace, self._default_limits)
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if versions is not None and versions != self._read_versions(conn, versions):
+                conn.execute("ROLLBACK")
+                return None
+
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries "
+                "(namespace, key, value, size, expires, stale_until, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (namespace, key, blob, len(blob), expires, stale_until, time.time()),
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO cache_tags (tag, namespace, key) VALUES (?, ?, ?)",
+                [(tag, namespace, key) for tag in tags],
+            )
+
+            # Вытеснение давно неиспользуемых записей сверх лимитов
+            rows = conn.execute(
+                "SELECT key, size FROM cache_entries WHERE namespace = ? "
+                "ORDER BY accessed DESC",
+                (namespace,),
+            ).fetchall()
+            total_bytes = 0
+            evicted = []
+            for idx, (entry_key, size) in enumerate(rows):
+                total_bytes += size
+                if idx >= max_entries or total_bytes > max_bytes:
+                    evicted.append((namespace, entry_key))
+            conn.executemany(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key = ?", evicted
+            )
+            conn.execute("COMMIT")
+            return len(evicted)
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    async def set(
+        self,
+        key: str,
+        value: Any,
+        ttl_seconds: int = 300,
+        namespace: str = DEFAULT_NAMESPACE,
+        stale_ttl_seconds: int = 0,
+        tags=(),
+        versions: Dict[str, int] | None = None,
+    ):
+        """Сохранить значение в кеш в сериализованном виде"""
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+        _, max_bytes = self._limits.get(namespace, self._default_limits)
+        if len(blob) > max_bytes:
+            logger.warning(
+                f"Значение {namespace}:{key} ({len(blob)} байт) больше лимита "
+                f"пространства имен ({max_bytes} байт), не кешируется"
+            )
+            return
+
+        expires = time.time() + ttl_seconds
+        evicted = await self._run(
+            self._write_entry,
+            namespace,
+            key,
+            blob,
+            expires,
+            expires + stale_ttl_seconds,
+            tuple(tags),
+            versions,
+        )
+        if evicted is not None:
+            stats = self.stats(namespace)
+            stats.record_store(len(blob))
+            stats.evictions += evicted
+
+    async def delete(self, key: str, namespace: str = DEFAULT_NAMESPACE):
+        """Удалить конкретный ключ из кэша"""
+        await self._run(
+            lambda conn: conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            )
+        )
+
+    async def clear(self, namespace: str | None = None):
+        """Очистить кеш (целиком или одно пространство имен)"""
+        if namespace is None:
+            await self._run(lambda conn: conn.execute("DELETE FROM cache_entries"))
+        else:
+            await self._run(
+                lambda conn: conn.execute(
+                    "DELETE FROM cache_entries WHERE namespace = ?", (namespace,)
+                )
+            )
+
+    @staticmethod
+    def _invalidate(conn: sqlite3.Connection, tags: tuple) -> Dict[str, int]:
+        """Удалить записи по тегам, возвращает количество удаленных по пространствам"""
+        affected = (
+            f"SELECT DISTINCT namespace, key FROM cache_tags "
+            f"WHERE tag IN ({','.join('?' * len(tags))})"
+        )
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO cache_tag_versions (tag, version) VALUES (?, 1) "
+                "ON CONFLICT (tag) DO UPDATE SET version = version + 1",
+                [(tag,) for tag in tags],
+            )
+            removed = dict(
+                conn.execute(
+                    f"SELECT namespace, count(*) FROM ({affected}) GROUP BY namespace",
+                    tags,
+                ).fetchall()
+            )
+            conn.execute(
+                f"DELETE FROM cache_entries WHERE (namespace, key) IN ({affected})",
+                tags,
+            )
+            conn.execute("COMMIT")
+            return removed
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    async def invalidate_tags(self, *tags: str) -> int:
+        """Удалить записи, зависящие от любого из тегов, во всех воркерах"""
+        if not tags:
+            return 0
+
+        removed = await self._run(self._invalidate, tags)
+        for namespace, count in removed.items():
+            self.stats(namespace).invalidations += count
+        return sum(removed.values())
+
+    async def sweep_expired(self) -> int:
+        """Удалить все просроченные записи, возвращает количество удаленных"""
+        return await self._run(
+            lambda conn: conn.execute(
+                "DELETE FROM cache_entries WHERE max(expires, stale_until) <= ?",
+                (time.time(),),
+            ).rowcount
+        )
+
+    def _describe(self, conn: sqlite3.Connection, top_keys: int) -> list[dict]:
+        now = time.time()
+        result = []
+
+        rows = conn.execute(
+            "SELECT namespace, count(*), sum(size) FROM cache_entries "
+            "GROUP BY namespace ORDER BY namespace"
+        ).fetchall()
+        for namespace, entries, total_bytes in rows:
+            max_entries, max_bytes = self._limits.get(namespace, self._default_limits)
+            largest = conn.execute(
+                "SELECT e.key, e.size, e.expires, "
+                "(SELECT group_concat(t.tag) FROM cache_tags t "
+                "WHERE t.namespace = e.namespace AND t.key = e.key) "
+                "FROM cache_entries e WHERE e.namespace = ? "
+                "ORDER BY e.size DESC LIMIT ?",
+                (namespace, top_keys),
+            ).fetchall()
+            result.append(
+                {
+                    "namespace": namespace,
+                    "entries": entries,
+                    "total_bytes": total_bytes,
+                    "max_entries": max_entries,
+                    "max_bytes": max_bytes,
+                    "top_keys": [
+                        {
+                            "key": key,
+                            "size": size,
+                            "expires_in": expires - now,
+                            "tags": sorted(tags.split(",")) if tags else [],
+                        }
+                        for key, size, expires, tags in largest
+                    ],
+                }
+            )
+
+        return result
+
+    async def describe(self, top_keys: int = 10) -> list[dict]:
+        """Состояние пространств имен в общем файле и самые крупные ключи"""
+        return await self._run(self._describe, top_keys)
+
+    async def close(self):
+        """Закрыть файл кеша"""
+        if self._conn is not None:
+            await self._run(lambda conn: conn.close())
+            self._conn = None
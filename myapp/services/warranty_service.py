@@ -6,6 +6,9 @@ from myapp.models.repair_case_equipment import RepairCaseEquipment
 from myapp.schemas.warranty import WarrantyWorkUpdate
 from myapp.database.transactional import transactional
 from myapp.database.query_builders.query_case_builders import load_warranty_relations
+from myapp.services.cache_bus_service import invalidation_bus
+from myapp.services.filter_options_service import FilterOptionsService
+from myapp.constants.cache_tags import TAG_WARRANTY_WORK
 
 
 class WarrantyService:
@@ -45,6 +48,10 @@ class WarrantyService:
         if not warranty_work:
             return None
 
+        facets_before = await FilterOptionsService.snapshot_case_facets(
+            session, case_id
+        )
+
         # Валидация соответствия статуса исследования и причины исследования
         update_data = warranty_data.model_dump(exclude_unset=True)
 
@@ -92,4 +99,7 @@ class WarrantyService:
         for field, value in update_data.items():
             setattr(warranty_work, field, value)
 
+        await FilterOptionsService.update_case_facets(session, case_id, facets_before)
+        await invalidation_bus.publish(session, TAG_WARRANTY_WORK)
+
         return warranty_work
@@ -6,6 +6,9 @@ from myapp.models.repair_case_equipment import RepairCaseEquipment
 from myapp.schemas.waybill import WaybillDocUpdate
 from myapp.database.transactional import transactional
 from myapp.database.query_builders.query_case_builders import load_waybill_relations
+from myapp.services.cache_bus_service import invalidation_bus
+from myapp.services.filter_options_service import FilterOptionsService
+from myapp.constants.cache_tags import TAG_WAYBILL_DOCS
 
 
 class WaybillService:
@@ -44,11 +47,18 @@ class WaybillService:
         waybill_doc = await WaybillService._get_waybill_doc_with_relations(
             case_id, session
         )
+        facets_before = await FilterOptionsService.snapshot_case_facets(
+            session, case_id
+        )
 
         if not waybill_doc:
             update_data = waybill_data.model_dump(exclude_unset=True)
             new_waybill_doc = WaybillDoc(**update_data, case_id=case_id)
             session.add(new_waybill_doc)
+            await FilterOptionsService.update_case_facets(
+                session, case_id, facets_before
+            )
+            await invalidation_bus.publish(session, TAG_WAYBILL_DOCS)
             return new_waybill_doc
 
         update_data = waybill_data.model_dump(exclude_unset=True)
@@ -56,4 +66,7 @@ class WaybillService:
         for field, value in update_data.items():
             setattr(waybill_doc, field, value)
 
+        await FilterOptionsService.update_case_facets(session, case_id, facets_before)
+        await invalidation_bus.publish(session, TAG_WAYBILL_DOCS)
+
         return waybill_doc
@@ -2,6 +2,26 @@ from typing import Any
 from sqlalchemy import select, distinct, and_, asc
 
 
+def normalize_filter_value(value: Any) -> Any:
+    """Значение фильтра без пустых элементов или None, если фильтр не задан"""
+    if value is None:
+        return None
+
+    if isinstance(value, list):
+        clean_list = [v for v in value if v is not None and str(v).strip() != ""]
+        return clean_list or None
+
+    val_str = str(value).strip()
+    if val_str == "" or val_str.lower() == "none":
+        return None
+    return value
+
+
+def escape_like(value: str) -> str:
+    """Экранирование спецсимволов LIKE"""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
 def process_query_results(result) -> list[Any]:
     """Универсальная обработка результатов запроса в список"""
     return [
@@ -0,0 +1,38 @@
+import asyncio
+from contextlib import suppress
+from typing import Any, Awaitable
+
+from fastapi import HTTPException, Request
+
+# Код ответа, если клиент отключился до готовности результата (как в nginx)
+CLIENT_CLOSED_REQUEST = 499
+
+# Как часто проверять, что клиент еще ждет ответа (с)
+DISCONNECT_POLL_INTERVAL = 0.5
+
+
+async def cancel_on_disconnect(
+    request: Request,
+    awaitable: Awaitable[Any],
+    poll_interval: float = DISCONNECT_POLL_INTERVAL,
+) -> Any:
+    """
+    Выполняет вычисление, пока клиент ждет ответа. Если клиент отключился
+    (закрыл страницу, сменил фильтры), вычисление отменяется, и его запросы
+    к БД освобождают подключения, не дожидаясь завершения.
+    """
+    work = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({work}, timeout=poll_interval)
+            if done:
+                return work.result()
+            if await request.is_disconnected():
+                raise HTTPException(
+                    status_code=CLIENT_CLOSED_REQUEST, detail="Клиент отключился"
+                )
+    finally:
+        if not work.done():
+            work.cancel()
+            with suppress(asyncio.CancelledError):
+                await work
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Микробенчмарк задержки попаданий в кеш при конкурентной нагрузке
+Использование: python -m scripts.cache_benchmark [кол-во корутин] [чтений на корутину]
+
+Сравнивает прежнюю схему (каждое чтение под общей asyncio.Lock)
+с текущим SimpleCache, где чтение идет без блокировки.
+Параллельно работает писатель, который периодически обновляет кеш.
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+
+from myapp.services.cache_service import SimpleCache
+
+NAMESPACE = "bench"
+HOT_KEYS = [f"key_{i}" for i in range(32)]
+
+
+class LockedReadCache(SimpleCache):
+    """Прежнее поведение: чтение под той же блокировкой, что и запись"""
+
+    async def get(self, key: str, namespace: str = NAMESPACE):
+        async with self._lock:
+            return await super().get(key, namespace)
+
+
+async def _reader(cache: SimpleCache, reads: int, latencies: list[float]):
+    for i in range(reads):
+        key = HOT_KEYS[i % len(HOT_KEYS)]
+        started = time.perf_counter()
+        await cache.get(key, NAMESPACE)
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(0)
+
+
+async def _writer(cache: SimpleCache, stop: asyncio.Event):
+    value = {"items": list(range(100))}
+    while not stop.is_set():
+        for key in HOT_KEYS:
+            await cache.set(key, value, 600, NAMESPACE)
+        await asyncio.sleep(0)
+
+
+async def run_benchmark(cache: SimpleCache, coroutines: int, reads: int) -> dict:
+    """Замеряет задержку попаданий для заданного экземпляра кеша"""
+    for key in HOT_KEYS:
+        await cache.set(key, {"items": list(range(100))}, 600, NAMESPACE)
+
+    latencies: list[float] = []
+    stop = asyncio.Event()
+    writer = asyncio.create_task(_writer(cache, stop))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(_reader(cache, reads, latencies) for _ in range(coroutines)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await writer
+
+    latencies.sort()
+    return {
+        "hits": len(latencies),
+        "p50_us": statistics.median(latencies) * 1e6,
+        "p99_us": latencies[int(len(latencies) * 0.99) - 1] * 1e6,
+        "max_us": latencies[-1] * 1e6,
+        "throughput": len(latencies) / elapsed,
+    }
+
+
+async def main():
+    coroutines = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    reads = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    print(f"Корутин: {coroutines}, чтений на корутину: {reads}")
+    for title, cache in (
+        ("До (чтение под блокировкой)", LockedReadCache()),
+        ("После (чтение без блокировки)", SimpleCache()),
+    ):
+        res = await run_benchmark(cache, coroutines, reads)
+        print(
+            f"{title}: p50={res['p50_us']:.1f} мкс, p99={res['p99_us']:.1f} мкс, "
+            f"max={res['max_us']:.1f} мкс, {res['throughput']:.0f} попаданий/с"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
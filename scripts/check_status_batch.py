@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Сверка пакетного вычисления статусов с calculate_case_status по строкам
+Использование: python -m scripts.check_status_batch [кол-во наборов] [seed]
+
+1. Случайные наборы входов (NULL, пустые строки, id справочников, даты
+   вокруг текущей) считаются CaseStatusService.evaluate_batch и отдельным
+   вызовом функции на каждый набор - результаты должны совпасть.
+2. Статусы первых случаев из БД, посчитанные пакетом, сравниваются
+   с хранимой колонкой status (расхождение - повод запустить
+   scripts.rebuild_statuses).
+Код выхода 1, если найдены расхождения.
+"""
+
+import asyncio
+import random
+import sys
+from datetime import date, timedelta
+
+from sqlalchemy import Date, Integer, func, literal, select
+from sqlalchemy.orm import selectinload
+
+from myapp.database.base import async_session_maker
+from myapp.models.repair_case_equipment import RepairCaseEquipment
+from myapp.services.case_status_service import (
+    DEFAULT_CASE_STATUS,
+    STATUS_INPUT_COLUMNS,
+    CaseStatusService,
+)
+
+STORED_SAMPLE_SIZE = 1000
+MAX_REPORTED = 10
+
+
+def random_value(rng: random.Random, column):
+    """Случайное значение входа: чаще NULL и граничные значения"""
+    if rng.random() < 0.4:
+        return None
+    if isinstance(column.type, Integer):
+        return rng.randint(1, 12)
+    if isinstance(column.type, Date):
+        return date.today() - timedelta(days=rng.randint(-5, 120))
+    return rng.choice(["", "1", "12-34", "АБ 5678"])
+
+
+def generate_columns(rng: random.Random, count: int) -> dict[str, list]:
+    return {
+        column.key: [random_value(rng, column) for _ in range(count)]
+        for column in STATUS_INPUT_COLUMNS
+    }
+
+
+async def status_by_row(session, values: tuple) -> str:
+    """Эталон: функция вызывается на один набор входов"""
+    args = [
+        literal(value, column.type)
+        for value, column in zip(values, STATUS_INPUT_COLUMNS)
+    ]
+    stmt = select(func.coalesce(func.calculate_case_status(*args), DEFAULT_CASE_STATUS))
+    return (await session.execute(stmt)).scalar_one()
+
+
+def report(title: str, mismatches: list) -> None:
+    print(f"{title}: расхождений {len(mismatches)}")
+    for item in mismatches[:MAX_REPORTED]:
+        print(f"  {item}")
+
+
+async def check_generated(session, count: int, seed: int) -> list:
+    columns = generate_columns(random.Random(seed), count)
+    batch = await CaseStatusService.evaluate_batch(session, columns)
+
+    mismatches = []
+    rows = zip(*(columns[column.key] for column in STATUS_INPUT_COLUMNS))
+    for values, batch_status in zip(rows, batch):
+        expected = await status_by_row(session, values)
+        if expected != batch_status:
+            mismatches.append((values, expected, batch_status))
+    return mismatches
+
+
+async def check_stored(session) -> list:
+    stmt = (
+        select(RepairCaseEquipment)
+        .options(
+            selectinload(RepairCaseEquipment.warranty_work),
+            selectinload(RepairCaseEquipment.waybill_doc),
+        )
+        .order_by(RepairCaseEquipment.id)
+        .limit(STORED_SAMPLE_SIZE)
+    )
+    cases = (await session.execute(stmt)).scalars().all()
+    batch = await CaseStatusService.evaluate_batch(
+        session, CaseStatusService.status_inputs(cases)
+    )
+    return [
+        (case.id, case.status, status)
+        for case, status in zip(cases, batch)
+        if case.status != status
+    ]
+
+
+async def main(count: int, seed: int) -> int:
+    async with async_session_maker() as session:
+        generated = await check_generated(session, count, seed)
+        stored = await check_stored(session)
+
+    report(f"Случайные наборы ({count}, seed={seed})", generated)
+    report("Хранимые статусы", stored)
+    return 1 if generated or stored else 0
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    sys.exit(asyncio.run(main(count, seed)))
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Полный пересчет таблицы фасетов (filter_facets) по всем случаям
+Использование: python -m scripts.rebuild_facets
+
+Нужен, если таблица разошлась с данными (например, после ручных правок в БД).
+Изменения случаев на время пересчета ждут его окончания.
+"""
+
+import asyncio
+
+from myapp.database.base import async_session_maker
+from myapp.services.cache_bus_service import invalidation_bus
+from myapp.services.filter_options_service import FilterOptionsService
+from myapp.constants.cache_tags import CASE_TAGS
+
+
+async def rebuild_facets():
+    async with async_session_maker() as session:
+        await FilterOptionsService.rebuild_facets(session)
+        # Воркеры приложения сбросят кеш по уведомлению после фиксации
+        await invalidation_bus.publish(session, *CASE_TAGS)
+        await session.commit()
+
+    print("Таблица фасетов пересчитана")
+
+
+if __name__ == "__main__":
+    asyncio.run(rebuild_facets())
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Полный пересчет хранимых статусов случаев, сводки сроков в статусах
+и таблицы фасетов (смены статусов пишутся в историю)
+Использование: python -m scripts.rebuild_statuses
+
+Нужен после изменения функции calculate_case_status в БД или ручных
+правок случаев, рекламационной работы и ТТН в обход приложения.
+"""
+
+import asyncio
+
+from myapp.database.base import async_session_maker
+from myapp.services.cache_bus_service import invalidation_bus
+from myapp.services.case_status_service import CaseStatusService
+from myapp.services.filter_options_service import FilterOptionsService
+from myapp.constants.cache_tags import CASE_TAGS
+
+
+async def rebuild_statuses():
+    async with async_session_maker() as session:
+        updated = await CaseStatusService.backfill_statuses(session, only_missing=False)
+        await FilterOptionsService.rebuild_facets(session)
+        # Воркеры приложения сбросят кеш по уведомлению после фиксации
+        await invalidation_bus.publish(session, *CASE_TAGS)
+        await session.commit()
+
+    print(f"Статусы пересчитаны: {updated} случаев")
+
+
+if __name__ == "__main__":
+    asyncio.run(rebuild_statuses())
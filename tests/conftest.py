@@ -0,0 +1,12 @@
+import os
+
+# Настройки приложения без .env: модули импортируются без подключения к БД
+for name, value in {
+    "DB_USER": "test",
+    "DB_PASSWORD": "test",
+    "DB_HOST": "localhost",
+    "DB_PORT": "5432",
+    "DB_NAME": "test",
+    "SECRET_KEY": "test",
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,135 @@
+"""
+Пакетное вычисление статусов без БД: порядок входов calculate_case_status,
+массивы параметров запроса, дедупликация и сборка ответа в evaluate_batch
+"""
+
+import random
+import re
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from myapp.database.query_builders.expressions import status_expr
+from myapp.services import case_status_service
+from myapp.services.case_status_service import (
+    DEFAULT_CASE_STATUS,
+    STATUS_INPUT_COLUMNS,
+    CaseStatusService,
+)
+from scripts.check_status_batch import generate_columns
+
+
+def compile_stmt(stmt):
+    return stmt.compile(dialect=postgresql.dialect())
+
+
+def input_arrays(compiled) -> list[list]:
+    """Массивы входов из параметров запроса в порядке unnest"""
+    names = re.findall(r"unnest\((.*?)\) WITH ORDINALITY", compiled.string)[0]
+    keys = re.findall(r"%\((\w+)\)s", names)
+    return [compiled.params[key] for key in keys]
+
+
+def fake_status(row: tuple) -> str | None:
+    """Детерминированная замена calculate_case_status"""
+    if all(value is None for value in row):
+        return None
+    return "|".join(str(value) for value in row)
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def all(self):
+        return self._rows
+
+
+class FakeSession:
+    """Вычисляет запрос пакета в Python и отдает строки в обратном порядке"""
+
+    def __init__(self):
+        self.batches: list[list[tuple]] = []
+
+    async def execute(self, stmt):
+        rows = list(zip(*input_arrays(compile_stmt(stmt))))
+        self.batches.append(rows)
+        result = [
+            (position, fake_status(row) or DEFAULT_CASE_STATUS)
+            for position, row in enumerate(rows, start=1)
+        ]
+        return FakeResult(result[::-1])
+
+
+def test_input_columns_follow_function_arguments():
+    assert STATUS_INPUT_COLUMNS == tuple(status_expr.element.clauses)
+
+    compiled = compile_stmt(CaseStatusService.build_batch_status_stmt([]))
+    arguments = re.findall(r"calculate_case_status\((.*?)\)", compiled.string)[0]
+    assert [arg.split(".")[-1] for arg in arguments.split(", ")] == [
+        column.key for column in STATUS_INPUT_COLUMNS
+    ]
+
+
+def test_batch_stmt_passes_one_typed_array_per_input():
+    rows = list(zip(*generate_columns(random.Random(0), 7).values()))
+    compiled = compile_stmt(CaseStatusService.build_batch_status_stmt(rows))
+
+    assert input_arrays(compiled) == [list(column) for column in zip(*rows)]
+    casts = re.findall(r"%\(\w+\)s::([\w()]+)\[\]", compiled.string)
+    assert casts == [
+        column.type.compile(dialect=postgresql.dialect())
+        for column in STATUS_INPUT_COLUMNS
+    ]
+    assert "WITH ORDINALITY" in compiled.string
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("seed", [0, 1, 2])
+async def test_evaluate_batch_maps_positions_back_to_rows(seed):
+    columns = generate_columns(random.Random(seed), 200)
+    rows = list(zip(*(columns[column.key] for column in STATUS_INPUT_COLUMNS)))
+
+    statuses = await CaseStatusService.evaluate_batch(FakeSession(), columns)
+
+    assert statuses == [fake_status(row) or DEFAULT_CASE_STATUS for row in rows]
+
+
+@pytest.mark.asyncio
+async def test_evaluate_batch_sends_each_input_set_once(monkeypatch):
+    monkeypatch.setattr(case_status_service, "STATUS_BATCH_SIZE", 3)
+    columns = generate_columns(random.Random(5), 10)
+    repeated = {key: values * 3 for key, values in columns.items()}
+    session = FakeSession()
+
+    statuses = await CaseStatusService.evaluate_batch(session, repeated)
+
+    sent = [row for batch in session.batches for row in batch]
+    assert len(sent) == len(set(sent))
+    assert all(len(batch) <= 3 for batch in session.batches)
+    assert statuses == statuses[:10] * 3
+
+
+@pytest.mark.asyncio
+async def test_evaluate_batch_without_rows_does_not_query():
+    session = FakeSession()
+    columns = {column.key: [] for column in STATUS_INPUT_COLUMNS}
+
+    assert await CaseStatusService.evaluate_batch(session, columns) == []
+    assert session.batches == []
+
+
+def test_status_inputs_reads_related_rows():
+    warranty = SimpleNamespace(notification_number="1", notification_summary_id=4)
+    case = SimpleNamespace(
+        repair_type_id=2, destination_id=None, warranty_work=warranty, waybill_doc=None
+    )
+
+    columns = CaseStatusService.status_inputs([case])
+
+    assert set(columns) == {column.key for column in STATUS_INPUT_COLUMNS}
+    assert columns["repair_type_id"] == [2]
+    assert columns["notification_summary_id"] == [4]
+    assert columns["ttn_from_rc"] == [None]
+    assert columns["research_document"] == [None]